@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共夹具
+"""
+
+from datetime import datetime
+
+import pytest
+
+from slow_query_collector import SlowQueryInfo
+
+
+_START_TIME = datetime(2026, 1, 2, 3, 4, 5)
+_END_TIME = datetime(2026, 1, 2, 3, 4, 15)
+
+
+@pytest.fixture
+def make_query():
+    """构造慢查询信息，未指定的字段使用不会触发任何阈值问题的默认值"""
+    def make(query_text: str = "SELECT id FROM t WHERE id = 1", query_id: str = "q1", **fields) -> SlowQueryInfo:
+        values = dict(
+            query_id=query_id,
+            query_text=query_text,
+            database="db",
+            user="root",
+            execution_time=2.0,
+            scan_rows=100,
+            scan_bytes=1024,
+            memory_used=1048576,
+            cpu_time=1.0,
+            start_time=_START_TIME,
+            end_time=_END_TIME,
+        )
+        values.update(fields)
+        return SlowQueryInfo(**values)
+    return make
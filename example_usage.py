@@ -160,20 +160,16 @@ def example_multiple_reports():
     
     analyzer = StarRocksSlowQueryAnalyzer('config.yaml')
     
+    # 一次分析，并行生成多种格式的报告
     formats = ['html', 'markdown', 'json']
-    report_paths = []
+    analyzer.report_generator.report_format = formats
     
-    for fmt in formats:
-        # 修改报告格式
-        analyzer.report_generator.report_format = fmt
-        
-        # 执行分析
-        report_path = analyzer.analyze(
-            time_range_hours=6,
-            min_execution_time=1.0
-        )
-        
-        report_paths.append((fmt, report_path))
+    report_paths = analyzer.analyze(
+        time_range_hours=6,
+        min_execution_time=1.0
+    )
+    
+    for fmt, report_path in zip(formats, report_paths):
         print(f"✅ {fmt.upper()} 报告已生成: {report_path}")
     
     print()
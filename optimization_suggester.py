@@ -5,16 +5,82 @@
 生成针对性的 SQL 优化建议
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
+from functools import lru_cache
 import re
+import sys
 import logging
 
-logging.basicConfig(level=logging.INFO)
+from query_analyzer import ProblemType, SEVERITY_HIGH, SEVERITY_MEDIUM, SEVERITY_LOW
+from sql_regex import compile_pattern
+
 logger = logging.getLogger(__name__)
 
+# 预编译的正则表达式
+_RE_LIKE_PREFIX = compile_pattern(r"LIKE\s+['\"]%", re.IGNORECASE)
+_RE_WHERE = compile_pattern(r'WHERE\s+([^;]+)', re.IGNORECASE)
+_RE_WHERE_END = compile_pattern(r'ORDER BY|GROUP BY', re.IGNORECASE)
+_RE_WHERE_COLUMN = compile_pattern(r'\b([a-zA-Z_][a-zA-Z0-9_]*)\s*[=<>!]')
+_RE_ORDER = compile_pattern(r'ORDER BY\s+([^;]+)', re.IGNORECASE)
+_RE_JOIN_ON = compile_pattern(r'ON\s+([^;]+?)(?:JOIN|WHERE|GROUP BY|ORDER BY|$)', re.IGNORECASE)
+_RE_IDENT = compile_pattern(r'\b([a-zA-Z_][a-zA-Z0-9_]*)\b')
+
+_TABLE_KEYWORDS = ('FROM', 'JOIN', 'INTO', 'UPDATE', 'TABLE')
+_RE_TABLE_BY_KEYWORD = tuple(
+    compile_pattern(rf'{keyword}\s+([^\s,;]+)', re.IGNORECASE) for keyword in _TABLE_KEYWORDS
+)
+
+# 紧跟在关键字后但不是表名的词
+_NOT_TABLE_NAMES = frozenset(('WHERE', 'ON', 'SELECT', 'AS'))
+
+# 数据类在 Python 3.10+ 上使用 __slots__，减少每个实例的内存占用
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+# 建议类别（驻留字符串）
+CATEGORY_INDEX = sys.intern("INDEX")
+CATEGORY_QUERY = sys.intern("QUERY")
+CATEGORY_SCHEMA = sys.intern("SCHEMA")
+CATEGORY_CONFIG = sys.intern("CONFIG")
+
+# 建议文本模板：固定部分保存在常量中，调用时只格式化与查询相关的字段
+_INDEX_DESCRIPTION = "查询执行时间过长（{execution_time:.2f}s），建议为相关列添加索引".format
+_INDEX_CREATE_SQL = "-- 为表添加索引建议\nCREATE INDEX idx_optimization ON your_table ({columns});".format
+_INDEX_NOTES = "1. 确认 {columns} 列的选择性\n2. 考虑创建复合索引\n3. 分析索引的使用频率".format
+_ROW_REDUCTION_DESCRIPTION = "当前扫描 {scan_rows} 行，远超建议阈值".format
+
+_OR_REPLACEMENT_SQL = """-- 建议使用 UNION ALL 替代 OR
+SELECT * FROM table1 WHERE condition1
+UNION ALL
+SELECT * FROM table1 WHERE condition2;"""
+
+_FUNCTION_OPTIMIZATION_SQL = """-- 示例：将函数移到比较符号另一侧
+-- 原始: WHERE YEAR(created_at) = 2023
+-- 优化: WHERE created_at >= '2023-01-01' AND created_at < '2024-01-01'"""
+
+_ROW_REDUCTION_SQL = """-- 建议优化查询减少扫描行数
+-- 当前扫描行数: {scan_rows}
+
+1. 添加更精确的 WHERE 条件
+2. 利用分区裁剪
+3. 使用索引覆盖
+4. 考虑数据分区策略""".format
 
-@dataclass
+_CTE_OR_JOIN_SQL = """-- 建议使用 CTE (WITH 子句) 或 JOIN
+-- CTE 示例:
+WITH cte1 AS (
+    SELECT ... FROM table1 WHERE ...
+),
+cte2 AS (
+    SELECT ... FROM table2 WHERE ...
+)
+SELECT ... FROM cte1 JOIN cte2 ON ...;"""
+
+# 按 SQL 文本缓存的提取结果数量上限
+_EXTRACT_CACHE_SIZE = 4096
+
+
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class OptimizationSuggestion:
     """优化建议"""
     title: str
@@ -38,6 +104,17 @@ class OptimizationSuggester:
             config: 配置参数
         """
         self.config = config or {}
+        
+        # 问题类型 -> 建议生成方法（直接以枚举成员为键）
+        self._suggesters = {
+            ProblemType.FULL_TABLE_SCAN: self._suggest_index_optimization,
+            ProblemType.SELECT_STAR: self._suggest_specific_columns,
+            ProblemType.LIKE_PREFIX_WILDCARD: self._suggest_like_optimization,
+            ProblemType.OR_CONDITION: self._suggest_or_replacement,
+            ProblemType.FUNCTION_IN_WHERE: self._suggest_function_optimization,
+            ProblemType.TOO_MANY_ROWS: self._suggest_row_reduction,
+            ProblemType.SUBQUERY_INEFFICIENT: self._suggest_cte_or_join,
+        }
     
     def generate_suggestions(
         self,
@@ -82,26 +159,9 @@ class OptimizationSuggester:
         Returns:
             优化建议
         """
-        problem_type = problem.problem_type
-        sql = query_info.query_text
-        
         # 根据问题类型生成建议
-        if problem_type.name == "FULL_TABLE_SCAN":
-            return self._suggest_index_optimization(query_info, problem)
-        elif problem_type.name == "SELECT_STAR":
-            return self._suggest_specific_columns(query_info, problem)
-        elif problem_type.name == "LIKE_PREFIX_WILDCARD":
-            return self._suggest_like_optimization(query_info, problem)
-        elif problem_type.name == "OR_CONDITION":
-            return self._suggest_or_replacement(query_info, problem)
-        elif problem_type.name == "FUNCTION_IN_WHERE":
-            return self._suggest_function_optimization(query_info, problem)
-        elif problem_type.name == "TOO_MANY_ROWS":
-            return self._suggest_row_reduction(query_info, problem)
-        elif problem_type.name == "SUBQUERY_INEFFICIENT":
-            return self._suggest_cte_or_join(query_info, problem)
-        
-        return None
+        suggest = self._suggesters.get(problem.problem_type)
+        return suggest(query_info, problem) if suggest else None
     
     def _suggest_index_optimization(self, query_info, problem) -> OptimizationSuggestion:
         """建议索引优化"""
@@ -117,25 +177,21 @@ class OptimizationSuggester:
         join_columns = self._extract_join_columns(sql)
         
         columns = where_columns + order_columns + join_columns
-        columns = list(set(columns))  # 去重
+        columns = list(dict.fromkeys(columns))  # 去重并保持顺序
         
         if not columns:
             columns = ["相关列"]
-        
-        index_create = f"""
--- 为表添加索引建议
-CREATE INDEX idx_optimization ON your_table ({', '.join(columns)});
-"""
+        column_list = ', '.join(columns)
         
         return OptimizationSuggestion(
             title="添加索引优化查询",
-            description=f"查询执行时间过长（{query_info.execution_time:.2f}s），建议为相关列添加索引",
-            priority="HIGH",
-            category="INDEX",
+            description=_INDEX_DESCRIPTION(execution_time=query_info.execution_time),
+            priority=SEVERITY_HIGH,
+            category=CATEGORY_INDEX,
             original_sql=sql,
-            suggested_sql=index_create.strip(),
+            suggested_sql=_INDEX_CREATE_SQL(columns=column_list),
             estimated_improvement="预计可提升 50%-90% 的查询性能",
-            implementation_notes=f"1. 确认 {', '.join(columns)} 列的选择性\n2. 考虑创建复合索引\n3. 分析索引的使用频率"
+            implementation_notes=_INDEX_NOTES(columns=column_list)
         )
     
     def _suggest_specific_columns(self, query_info, problem) -> OptimizationSuggestion:
@@ -153,8 +209,8 @@ CREATE INDEX idx_optimization ON your_table ({', '.join(columns)});
         return OptimizationSuggestion(
             title="避免使用 SELECT *",
             description="SELECT * 会返回所有列，增加 I/O 和网络传输开销",
-            priority="MEDIUM",
-            category="QUERY",
+            priority=SEVERITY_MEDIUM,
+            category=CATEGORY_QUERY,
             original_sql=sql,
             suggested_sql=suggested_sql.strip(),
             estimated_improvement="减少 30%-70% 的数据传输量",
@@ -165,18 +221,13 @@ CREATE INDEX idx_optimization ON your_table ({', '.join(columns)});
         """建议优化 LIKE 查询"""
         sql = query_info.query_text
         
-        suggested_sql = re.sub(
-            r"LIKE\s+['\"]%",
-            "LIKE '",
-            sql,
-            flags=re.IGNORECASE
-        )
+        suggested_sql = _RE_LIKE_PREFIX.sub("LIKE '", sql)
         
         return OptimizationSuggestion(
             title="优化 LIKE 查询",
             description="LIKE 使用前缀通配符（%xxx）无法使用索引",
-            priority="HIGH",
-            category="QUERY",
+            priority=SEVERITY_HIGH,
+            category=CATEGORY_QUERY,
             original_sql=sql,
             suggested_sql=suggested_sql,
             estimated_improvement="索引命中率从 0% 提升到接近 100%",
@@ -187,20 +238,13 @@ CREATE INDEX idx_optimization ON your_table ({', '.join(columns)});
         """建议用 UNION ALL 替代 OR"""
         sql = query_info.query_text
         
-        # 简化的建议
-        suggested_sql = f"""-- 建议使用 UNION ALL 替代 OR
-SELECT * FROM table1 WHERE condition1
-UNION ALL
-SELECT * FROM table1 WHERE condition2;
-"""
-        
         return OptimizationSuggestion(
             title="用 UNION ALL 替代 OR",
             description="OR 条件可能导致索引失效，使用 UNION ALL 可能更高效",
-            priority="LOW",
-            category="QUERY",
+            priority=SEVERITY_LOW,
+            category=CATEGORY_QUERY,
             original_sql=sql,
-            suggested_sql=suggested_sql.strip(),
+            suggested_sql=_OR_REPLACEMENT_SQL,
             estimated_improvement="索引命中率可能提升 20%-50%",
             implementation_notes="1. 测试两种方式的性能\n2. 确保条件互斥时使用 UNION ALL\n3. 条件可能重叠时使用 UNION"
         )
@@ -209,18 +253,13 @@ SELECT * FROM table1 WHERE condition2;
         """建议优化 WHERE 子句中的函数"""
         sql = query_info.query_text
         
-        suggested_sql = """-- 示例：将函数移到比较符号另一侧
--- 原始: WHERE YEAR(created_at) = 2023
--- 优化: WHERE created_at >= '2023-01-01' AND created_at < '2024-01-01'
-"""
-        
         return OptimizationSuggestion(
             title="避免 WHERE 子句中使用函数",
             description="函数会阻止索引使用，建议改写查询逻辑",
-            priority="MEDIUM",
-            category="QUERY",
+            priority=SEVERITY_MEDIUM,
+            category=CATEGORY_QUERY,
             original_sql=sql,
-            suggested_sql=suggested_sql.strip(),
+            suggested_sql=_FUNCTION_OPTIMIZATION_SQL,
             estimated_improvement="索引命中率可从 0% 提升到 100%",
             implementation_notes="1. 将函数应用到常量上\n2. 使用范围查询代替函数\n3. 考虑创建计算列索引"
         )
@@ -228,23 +267,15 @@ SELECT * FROM table1 WHERE condition2;
     def _suggest_row_reduction(self, query_info, problem) -> OptimizationSuggestion:
         """建议减少扫描行数"""
         sql = query_info.query_text
-        
-        suggested_sql = f"""-- 建议优化查询减少扫描行数
--- 当前扫描行数: {query_info.scan_rows_formatted}
-
-1. 添加更精确的 WHERE 条件
-2. 利用分区裁剪
-3. 使用索引覆盖
-4. 考虑数据分区策略
-"""
+        scan_rows = query_info.scan_rows_formatted
         
         return OptimizationSuggestion(
             title="减少扫描行数",
-            description=f"当前扫描 {query_info.scan_rows_formatted} 行，远超建议阈值",
-            priority="HIGH",
-            category="QUERY",
+            description=_ROW_REDUCTION_DESCRIPTION(scan_rows=scan_rows),
+            priority=SEVERITY_HIGH,
+            category=CATEGORY_QUERY,
             original_sql=sql,
-            suggested_sql=suggested_sql.strip(),
+            suggested_sql=_ROW_REDUCTION_SQL(scan_rows=scan_rows),
             estimated_improvement="可减少 50%-99% 的扫描行数",
             implementation_notes="1. 分析查询计划确定瓶颈\n2. 添加合适的 WHERE 条件\n3. 创建复合索引"
         )
@@ -253,79 +284,91 @@ SELECT * FROM table1 WHERE condition2;
         """建议使用 CTE 或 JOIN"""
         sql = query_info.query_text
         
-        suggested_sql = """-- 建议使用 CTE (WITH 子句) 或 JOIN
--- CTE 示例:
-WITH cte1 AS (
-    SELECT ... FROM table1 WHERE ...
-),
-cte2 AS (
-    SELECT ... FROM table2 WHERE ...
-)
-SELECT ... FROM cte1 JOIN cte2 ON ...;
-"""
-        
         return OptimizationSuggestion(
             title="优化子查询为 CTE 或 JOIN",
             description="子查询可能导致性能问题，考虑使用 CTE 或 JOIN",
-            priority="MEDIUM",
-            category="QUERY",
+            priority=SEVERITY_MEDIUM,
+            category=CATEGORY_QUERY,
             original_sql=sql,
-            suggested_sql=suggested_sql.strip(),
+            suggested_sql=_CTE_OR_JOIN_SQL,
             estimated_improvement="预计提升 20%-60% 的性能",
             implementation_notes="1. 评估子查询是否可转为 JOIN\n2. 使用 CTE 提高可读性\n3. 测试优化前后性能"
         )
     
     def _extract_where_columns(self, sql: str) -> List[str]:
         """提取 WHERE 条件中的列名"""
-        columns = []
-        # 简化的列名提取
-        where_match = re.search(r'WHERE\s+([^;]+)', sql, re.IGNORECASE)
-        if where_match:
-            where_clause = where_match.group(1)
-            # 移除 ORDER BY 和 GROUP BY
-            where_clause = re.split(r'ORDER BY|GROUP BY', where_clause, flags=re.IGNORECASE)[0]
-            
-            # 提取列名（简化）
-            tokens = re.findall(r'\b([a-zA-Z_][a-zA-Z0-9_]*)\s*[=<>!]', where_clause)
-            columns.extend(tokens)
-        
-        return columns
+        return list(_extract_where_columns_cached(sql))
     
     def _extract_order_columns(self, sql: str) -> List[str]:
         """提取 ORDER BY 列名"""
-        columns = []
-        order_match = re.search(r'ORDER BY\s+([^;]+)', sql, re.IGNORECASE)
-        if order_match:
-            order_clause = order_match.group(1)
-            # 提取列名（简化，去除逗号和方向）
-            tokens = re.findall(r'\b([a-zA-Z_][a-zA-Z0-9_]*)\b', order_clause)
-            columns.extend(tokens)
-        
-        return columns
+        return list(_extract_order_columns_cached(sql))
     
     def _extract_join_columns(self, sql: str) -> List[str]:
         """提取 JOIN 条件中的列名"""
-        columns = []
-        join_match = re.findall(r'ON\s+([^;]+?)(?:JOIN|WHERE|GROUP BY|ORDER BY|$)', sql, re.IGNORECASE)
-        for match in join_match:
-            # 提取列名（简化）
-            tokens = re.findall(r'\b([a-zA-Z_][a-zA-Z0-9_]*)\b', match)
-            columns.extend(tokens)
-        
-        return columns
+        return list(_extract_join_columns_cached(sql))
     
     def _extract_table_names(self, sql: str) -> List[str]:
         """提取表名（简化版本）"""
-        tables = []
-        keywords = ['FROM', 'JOIN', 'INTO', 'UPDATE', 'TABLE']
-        
-        for keyword in keywords:
-            pattern = rf'{keyword}\s+([^\s,;]+)'
-            matches = re.findall(pattern, sql, re.IGNORECASE)
-            for match in matches:
-                table = match.strip('`"[]')
-                if table and table.upper() not in ['WHERE', 'ON', 'SELECT', 'AS']:
-                    tables.append(table)
+        return list(_extract_table_names_cached(sql))
+
+
+# 同一批慢查询中常有大量重复 SQL，按 SQL 文本缓存提取结果（返回元组以保证缓存值不可变）
+
+@lru_cache(maxsize=_EXTRACT_CACHE_SIZE)
+def _extract_where_columns_cached(sql: str) -> Tuple[str, ...]:
+    """提取 WHERE 条件中的列名"""
+    columns = []
+    # 简化的列名提取
+    where_match = _RE_WHERE.search(sql)
+    if where_match:
+        where_clause = where_match.group(1)
+        # 移除 ORDER BY 和 GROUP BY
+        where_clause = _RE_WHERE_END.split(where_clause)[0]
         
-        return list(set(tables))
+        # 提取列名（简化）
+        tokens = _RE_WHERE_COLUMN.findall(where_clause)
+        columns.extend(tokens)
+    
+    return tuple(columns)
 
+
+@lru_cache(maxsize=_EXTRACT_CACHE_SIZE)
+def _extract_order_columns_cached(sql: str) -> Tuple[str, ...]:
+    """提取 ORDER BY 列名"""
+    columns = []
+    order_match = _RE_ORDER.search(sql)
+    if order_match:
+        order_clause = order_match.group(1)
+        # 提取列名（简化，去除逗号和方向）
+        tokens = _RE_IDENT.findall(order_clause)
+        columns.extend(tokens)
+    
+    return tuple(columns)
+
+
+@lru_cache(maxsize=_EXTRACT_CACHE_SIZE)
+def _extract_join_columns_cached(sql: str) -> Tuple[str, ...]:
+    """提取 JOIN 条件中的列名"""
+    columns = []
+    join_match = _RE_JOIN_ON.findall(sql)
+    for match in join_match:
+        # 提取列名（简化）
+        tokens = _RE_IDENT.findall(match)
+        columns.extend(tokens)
+    
+    return tuple(columns)
+
+
+@lru_cache(maxsize=_EXTRACT_CACHE_SIZE)
+def _extract_table_names_cached(sql: str) -> Tuple[str, ...]:
+    """提取表名（简化版本）"""
+    tables = []
+    
+    for pattern in _RE_TABLE_BY_KEYWORD:
+        matches = pattern.findall(sql)
+        for match in matches:
+            table = match.strip('`"[]')
+            if table and table.upper() not in _NOT_TABLE_NAMES:
+                tables.append(table)
+    
+    return tuple(dict.fromkeys(tables))
@@ -5,16 +5,83 @@ SQL 查询分析器
 分析 SQL 性能问题并生成诊断报告
 """
 
-import sqlparse
-from typing import List, Dict, Any, Set, Optional
+from typing import List, Dict, Any, Set, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass
+from functools import lru_cache
 from enum import Enum
+import multiprocessing
+import os
 import re
+import sys
 import logging
 
-logging.basicConfig(level=logging.INFO)
+import numpy as np
+
+from sql_regex import compile_pattern
+
 logger = logging.getLogger(__name__)
 
+# SQL 结构检查：一遍扫描记录出现了哪些关键字，需要上下文的检查只在对应关键字出现时再单独匹配。
+# 各正则都不使用前瞻断言，安装了 RE2 时均以 RE2 编译（线性时间，无回溯）。
+_RE_STRUCTURE = compile_pattern(
+    r"(?P<star>SELECT \*)"
+    r"|(?P<or>\bOR\b)"
+    r"|(?P<like>LIKE)"
+    r"|(?P<from>FROM)"
+    r"|(?P<where>WHERE)"
+    r"|(?P<join>JOIN)"
+    r"|(?P<agg>(?:COUNT|SUM|AVG|MAX|MIN)\()",
+    re.IGNORECASE
+)
+_RE_LIKE_PREFIX_WILDCARD = compile_pattern(r"LIKE\s+['\"]%[^%]", re.IGNORECASE)
+_RE_SUBQUERY = compile_pattern(r"FROM\s*\([^)]+SELECT", re.IGNORECASE)
+_RE_FUNCTION_IN_WHERE = compile_pattern(r"WHERE\s+[^;]*[A-Z_]\([^;)]+\)", re.IGNORECASE)
+
+_RE_LEADING_KEYWORD = compile_pattern(r'\s*([A-Za-z]+)')
+
+# 数字字面量，替换为 ? 得到 SQL 指纹。结构检查不依赖数字的取值，只是参数不同的同一模板共用一次分析；
+# 字符串字面量保留原样，LIKE 前缀通配符等检查依赖其内容
+_RE_NUMBER_LITERAL = compile_pattern(r'\b\d+\b')
+
+_TABLE_KEYWORDS = ('FROM', 'JOIN', 'INTO', 'UPDATE', 'TABLE')
+_RE_TABLE_BY_KEYWORD = tuple(
+    compile_pattern(rf'{keyword}\s+([^\s,;]+)', re.IGNORECASE) for keyword in _TABLE_KEYWORDS
+)
+
+# 紧跟在关键字后但不是表名的词
+_NOT_TABLE_NAMES = frozenset(('WHERE', 'ON', 'SELECT', 'AS'))
+
+# 数据类在 Python 3.10+ 上使用 __slots__，减少每个实例的内存占用
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+# 严重程度（驻留字符串，报告中分组、计数时按指针比较）
+SEVERITY_CRITICAL = sys.intern("CRITICAL")
+SEVERITY_HIGH = sys.intern("HIGH")
+SEVERITY_MEDIUM = sys.intern("MEDIUM")
+SEVERITY_LOW = sys.intern("LOW")
+
+# 数值阈值
+_CRITICAL_EXECUTION_TIME = 10.0  # 秒
+_HIGH_EXECUTION_TIME = 5.0  # 秒
+_MAX_MEMORY_USED = 536870912  # 512MB
+
+# 按 SQL 文本缓存的解析结果数量上限
+_SQL_CACHE_SIZE = 4096
+
+# 进程池每次分发的 SQL 数量，用于摊薄进程间通信开销
+_PARALLEL_CHUNK_SIZE = 64
+
+# 数值阈值检查使用 numba 内核的最小批量。导入 numba 并加载编译缓存约需 0.5 秒，
+# 小批量上 NumPy 只需几十微秒，不值得为此导入 numba
+_NUMBA_MIN_BATCH = 100000
+
+# 不从当前进程直接 fork 工作进程：numba 并行内核启动的线程池在 fork 后会导致进程退出时挂起
+_MP_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+
 
 class QueryType(Enum):
     """查询类型"""
@@ -30,6 +97,10 @@ class QueryType(Enum):
     OTHER = "OTHER"
 
 
+# SQL 首个关键字到查询类型的映射
+_KEYWORD_TO_TYPE = {t.value: t for t in QueryType if t is not QueryType.OTHER}
+
+
 class ProblemType(Enum):
     """问题类型"""
     FULL_TABLE_SCAN = "全表扫描"
@@ -48,7 +119,7 @@ class ProblemType(Enum):
     FUNCTION_IN_WHERE = "WHERE 子句中使用函数"
 
 
-@dataclass
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class QueryProblem:
     """查询问题"""
     problem_type: ProblemType
@@ -58,6 +129,130 @@ class QueryProblem:
     evidence: str
 
 
+# 数值阈值问题的构造函数，逐条分析与批量分析共用
+
+def _critical_execution_time_problem(query_info) -> QueryProblem:
+    return QueryProblem(
+        problem_type=ProblemType.FULL_TABLE_SCAN,
+        severity=SEVERITY_CRITICAL,
+        description=f"查询执行时间过长: {query_info.execution_time:.2f} 秒",
+        suggestion="检查是否有全表扫描，考虑添加索引或优化查询逻辑",
+        evidence=f"执行时间: {query_info.execution_time:.2f}s"
+    )
+
+
+def _high_execution_time_problem(query_info) -> QueryProblem:
+    return QueryProblem(
+        problem_type=ProblemType.FULL_TABLE_SCAN,
+        severity=SEVERITY_HIGH,
+        description=f"查询执行时间较长: {query_info.execution_time:.2f} 秒",
+        suggestion="分析查询计划，检查是否需要优化",
+        evidence=f"执行时间: {query_info.execution_time:.2f}s"
+    )
+
+
+def _scan_rows_problem(query_info) -> QueryProblem:
+    return QueryProblem(
+        problem_type=ProblemType.TOO_MANY_ROWS,
+        severity=SEVERITY_HIGH,
+        description=f"扫描行数过多: {query_info.scan_rows_formatted}",
+        suggestion="考虑添加合适的 WHERE 条件或索引，减少扫描行数",
+        evidence=f"扫描行数: {query_info.scan_rows}"
+    )
+
+
+def _scan_bytes_problem(query_info) -> QueryProblem:
+    return QueryProblem(
+        problem_type=ProblemType.TOO_MANY_ROWS,
+        severity=SEVERITY_HIGH,
+        description=f"扫描数据量过大: {query_info.scan_bytes_formatted}",
+        suggestion="只查询需要的列，避免 SELECT *，考虑分区裁剪",
+        evidence=f"扫描字节数: {query_info.scan_bytes}"
+    )
+
+
+def _memory_problem(query_info) -> QueryProblem:
+    return QueryProblem(
+        problem_type=ProblemType.MEMORY_INTENSIVE,
+        severity=SEVERITY_MEDIUM,
+        description=f"内存使用较高: {query_info.memory_used / 1048576:.2f} MB",
+        suggestion="考虑增加内存限制、优化查询或调整执行引擎参数",
+        evidence=f"内存使用: {query_info.memory_used / 1048576:.2f} MB"
+    )
+
+
+# 数值阈值检查结果按位编码，每条查询一个 uint8
+_FLAG_CRITICAL_TIME = 1
+_FLAG_HIGH_TIME = 2
+_FLAG_SCAN_ROWS = 4
+_FLAG_SCAN_BYTES = 8
+_FLAG_MEMORY = 16
+
+_THRESHOLD_PROBLEMS = (
+    (_FLAG_CRITICAL_TIME, _critical_execution_time_problem),
+    (_FLAG_HIGH_TIME, _high_execution_time_problem),
+    (_FLAG_SCAN_ROWS, _scan_rows_problem),
+    (_FLAG_SCAN_BYTES, _scan_bytes_problem),
+    (_FLAG_MEMORY, _memory_problem),
+)
+
+
+def _threshold_flags_numpy(exec_times, scan_rows, scan_bytes, memory_used, max_scan_rows, max_scan_bytes):
+    """向量化计算数值阈值标志"""
+    critical = exec_times >= _CRITICAL_EXECUTION_TIME
+    flags = np.where(critical, _FLAG_CRITICAL_TIME, 0).astype(np.uint8)
+    flags[~critical & (exec_times >= _HIGH_EXECUTION_TIME)] |= _FLAG_HIGH_TIME
+    flags[scan_rows > max_scan_rows] |= _FLAG_SCAN_ROWS
+    flags[scan_bytes > max_scan_bytes] |= _FLAG_SCAN_BYTES
+    flags[memory_used > _MAX_MEMORY_USED] |= _FLAG_MEMORY
+    return flags
+
+
+@lru_cache(maxsize=None)
+def _get_numba_threshold_flags():
+    """
+    首次需要时导入 numba 并编译数值阈值检查内核
+    
+    Returns:
+        JIT 编译的内核；未安装 numba 时为 None
+    """
+    try:
+        from numba import njit, prange
+    except ImportError:
+        return None
+    
+    @njit(parallel=True, cache=True)
+    def threshold_flags(exec_times, scan_rows, scan_bytes, memory_used, max_scan_rows, max_scan_bytes):
+        """JIT 编译的数值阈值检查，多线程执行且不持有 GIL"""
+        n = exec_times.shape[0]
+        flags = np.zeros(n, dtype=np.uint8)
+        for i in prange(n):
+            flag = 0
+            if exec_times[i] >= _CRITICAL_EXECUTION_TIME:
+                flag |= _FLAG_CRITICAL_TIME
+            elif exec_times[i] >= _HIGH_EXECUTION_TIME:
+                flag |= _FLAG_HIGH_TIME
+            if scan_rows[i] > max_scan_rows:
+                flag |= _FLAG_SCAN_ROWS
+            if scan_bytes[i] > max_scan_bytes:
+                flag |= _FLAG_SCAN_BYTES
+            if memory_used[i] > _MAX_MEMORY_USED:
+                flag |= _FLAG_MEMORY
+            flags[i] = flag
+        return flags
+    
+    return threshold_flags
+
+
+def _threshold_flags(exec_times, scan_rows, scan_bytes, memory_used, max_scan_rows, max_scan_bytes):
+    """计算数值阈值标志，批量达到 _NUMBA_MIN_BATCH 且安装了 numba 时使用 JIT 内核，否则使用 NumPy"""
+    if exec_times.shape[0] >= _NUMBA_MIN_BATCH:
+        kernel = _get_numba_threshold_flags()
+        if kernel is not None:
+            return kernel(exec_times, scan_rows, scan_bytes, memory_used, max_scan_rows, max_scan_bytes)
+    return _threshold_flags_numpy(exec_times, scan_rows, scan_bytes, memory_used, max_scan_rows, max_scan_bytes)
+
+
 class QueryAnalyzer:
     """查询分析器"""
     
@@ -71,14 +266,44 @@ class QueryAnalyzer:
         self.config = config or {}
         self.max_scan_rows = self.config.get('max_scan_rows', 10000000)
         self.max_scan_bytes = self.config.get('max_scan_bytes', 1073741824)
+        # SQL 结构分析的进程数（0 表示使用 CPU 核数，1 表示不启用多进程）
+        self.parallel_workers = self.config.get('parallel_workers', 0)
+        self.parallel_min_batch = self.config.get('parallel_min_batch', 500)
+        # 执行时间低于该值且扫描行数不足 max_scan_rows 的 1/10 时跳过 SQL 结构分析（0 表示不跳过）
+        self.structure_min_time = self.config.get('structure_analysis_min_time', 0.0)
+        # reuse_process_pool() 期间复用的进程池，首次需要时创建
+        self._reuse_pool = False
+        self._executor = None
     
-    def analyze_query(self, query_info, execution_plan: Optional[Dict] = None) -> List[QueryProblem]:
+    @contextmanager
+    def reuse_process_pool(self):
+        """
+        在 with 块内的多次批量分析之间复用同一个进程池，退出时关闭
+        
+        流水线分批调用 analyze_queries_batch 时使用，避免每批都启动、销毁工作进程。
+        """
+        self._reuse_pool = True
+        try:
+            yield self
+        finally:
+            self._reuse_pool = False
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+    
+    def analyze_query(
+        self,
+        query_info,
+        execution_plan: Optional[Dict] = None,
+        deep_analysis: bool = False
+    ) -> List[QueryProblem]:
         """
         分析查询并识别问题
         
         Args:
             query_info: 查询信息
             execution_plan: 执行计划
+            deep_analysis: 是否总是进行 SQL 结构分析（忽略 structure_analysis_min_time）
             
         Returns:
             问题列表
@@ -92,7 +317,8 @@ class QueryAnalyzer:
         problems.extend(self._analyze_scan_data(query_info))
         
         # 3. 分析 SQL 结构
-        problems.extend(self._analyze_sql_structure(query_info))
+        if deep_analysis or self._needs_structure_analysis(query_info):
+            problems.extend(self._analyze_sql_structure(query_info))
         
         # 4. 分析执行计划（如果有）
         if execution_plan:
@@ -100,26 +326,68 @@ class QueryAnalyzer:
         
         return problems
     
+    def analyze_queries_batch(self, query_infos: List, deep_analysis: bool = False) -> List[List[QueryProblem]]:
+        """
+        批量分析查询
+        
+        数值阈值检查（执行时间、扫描量、内存）对整批查询一次完成
+        （NumPy 向量化比较；大批量且安装了 numba 时使用 JIT 编译的并行内核），
+        SQL 结构分析仍逐条进行。结果与逐条调用 analyze_query 一致。
+        
+        Args:
+            query_infos: 查询信息列表
+            deep_analysis: 是否总是进行 SQL 结构分析（忽略 structure_analysis_min_time）
+            
+        Returns:
+            与 query_infos 一一对应的问题列表
+        """
+        n = len(query_infos)
+        problems_list = [[] for _ in range(n)]
+        if n == 0:
+            return problems_list
+        
+        exec_times = np.fromiter((q.execution_time for q in query_infos), dtype=np.float64, count=n)
+        scan_rows = np.fromiter((q.scan_rows for q in query_infos), dtype=np.int64, count=n)
+        scan_bytes = np.fromiter((q.scan_bytes for q in query_infos), dtype=np.int64, count=n)
+        memory_used = np.fromiter((q.memory_used for q in query_infos), dtype=np.int64, count=n)
+        
+        flags = _threshold_flags(
+            exec_times, scan_rows, scan_bytes, memory_used,
+            self.max_scan_rows, self.max_scan_bytes
+        )
+        
+        # 只为命中阈值的查询构造问题对象，顺序与 analyze_query 中的检查顺序一致
+        for i in np.flatnonzero(flags).tolist():
+            query_info = query_infos[i]
+            problems = problems_list[i]
+            query_flags = flags[i]
+            for flag, build in _THRESHOLD_PROBLEMS:
+                if query_flags & flag:
+                    problems.append(build(query_info))
+        
+        if deep_analysis:
+            indices = range(n)
+        else:
+            indices = [i for i, q in enumerate(query_infos) if self._needs_structure_analysis(q)]
+        structure_problems = self._analyze_sql_structure_batch([query_infos[i].query_text for i in indices])
+        for i, structure in zip(indices, structure_problems):
+            problems_list[i].extend(structure)
+        
+        return problems_list
+    
+    def _needs_structure_analysis(self, query_info) -> bool:
+        """执行快且扫描量小的查询不值得做 SQL 结构分析"""
+        return (query_info.execution_time >= self.structure_min_time
+                or query_info.scan_rows >= self.max_scan_rows // 10)
+    
     def _analyze_execution_time(self, query_info) -> List[QueryProblem]:
         """分析执行时间"""
         problems = []
         
-        if query_info.execution_time >= 10.0:
-            problems.append(QueryProblem(
-                problem_type=ProblemType.FULL_TABLE_SCAN,
-                severity="CRITICAL",
-                description=f"查询执行时间过长: {query_info.execution_time:.2f} 秒",
-                suggestion="检查是否有全表扫描，考虑添加索引或优化查询逻辑",
-                evidence=f"执行时间: {query_info.execution_time:.2f}s"
-            ))
-        elif query_info.execution_time >= 5.0:
-            problems.append(QueryProblem(
-                problem_type=ProblemType.FULL_TABLE_SCAN,
-                severity="HIGH",
-                description=f"查询执行时间较长: {query_info.execution_time:.2f} 秒",
-                suggestion="分析查询计划，检查是否需要优化",
-                evidence=f"执行时间: {query_info.execution_time:.2f}s"
-            ))
+        if query_info.execution_time >= _CRITICAL_EXECUTION_TIME:
+            problems.append(_critical_execution_time_problem(query_info))
+        elif query_info.execution_time >= _HIGH_EXECUTION_TIME:
+            problems.append(_high_execution_time_problem(query_info))
         
         return problems
     
@@ -129,117 +397,60 @@ class QueryAnalyzer:
         
         # 扫描行数过多
         if query_info.scan_rows > self.max_scan_rows:
-            problems.append(QueryProblem(
-                problem_type=ProblemType.TOO_MANY_ROWS,
-                severity="HIGH",
-                description=f"扫描行数过多: {query_info.scan_rows_formatted}",
-                suggestion="考虑添加合适的 WHERE 条件或索引，减少扫描行数",
-                evidence=f"扫描行数: {query_info.scan_rows}"
-            ))
+            problems.append(_scan_rows_problem(query_info))
         
         # 扫描字节数过多
         if query_info.scan_bytes > self.max_scan_bytes:
-            problems.append(QueryProblem(
-                problem_type=ProblemType.TOO_MANY_ROWS,
-                severity="HIGH",
-                description=f"扫描数据量过大: {query_info.scan_bytes_formatted}",
-                suggestion="只查询需要的列，避免 SELECT *，考虑分区裁剪",
-                evidence=f"扫描字节数: {query_info.scan_bytes}"
-            ))
+            problems.append(_scan_bytes_problem(query_info))
         
         # 内存使用过高
-        if query_info.memory_used > 536870912:  # 512MB
-            problems.append(QueryProblem(
-                problem_type=ProblemType.MEMORY_INTENSIVE,
-                severity="MEDIUM",
-                description=f"内存使用较高: {query_info.memory_used / 1048576:.2f} MB",
-                suggestion="考虑增加内存限制、优化查询或调整执行引擎参数",
-                evidence=f"内存使用: {query_info.memory_used / 1048576:.2f} MB"
-            ))
+        if query_info.memory_used > _MAX_MEMORY_USED:
+            problems.append(_memory_problem(query_info))
         
         return problems
     
     def _analyze_sql_structure(self, query_info) -> List[QueryProblem]:
         """分析 SQL 结构"""
-        problems = []
-        sql = query_info.query_text.upper()
+        return list(_analyze_sql_text(_sql_fingerprint(query_info.query_text)))
+    
+    def _analyze_sql_structure_batch(self, query_texts: List[str]) -> List[Tuple[QueryProblem, ...]]:
+        """
+        批量分析 SQL 结构
         
-        try:
-            parsed = sqlparse.parse(query_info.query_text)[0]
-            
-            # 检查 SELECT *
-            if 'SELECT *' in sql:
-                problems.append(QueryProblem(
-                    problem_type=ProblemType.SELECT_STAR,
-                    severity="MEDIUM",
-                    description="使用 SELECT * 可能会返回不必要的列",
-                    suggestion="明确指定需要的列，减少数据传输和内存使用",
-                    evidence="SELECT *"
-                ))
-            
-            # 检查 OR 条件
-            if re.search(r'\bOR\b', sql) and 'WHERE' in sql:
-                problems.append(QueryProblem(
-                    problem_type=ProblemType.OR_CONDITION,
-                    severity="LOW",
-                    description="使用 OR 条件可能导致索引失效",
-                    suggestion="考虑使用 UNION ALL 代替 OR，或优化查询逻辑",
-                    evidence="发现 OR 条件"
-                ))
-            
-            # 检查 LIKE 前缀通配符
-            if re.search(r'LIKE\s+[\'"]%[^%]', sql):
-                problems.append(QueryProblem(
-                    problem_type=ProblemType.LIKE_PREFIX_WILDCARD,
-                    severity="HIGH",
-                    description="LIKE 使用前缀通配符 %... 无法使用索引",
-                    suggestion="避免前缀通配符，考虑使用全文索引或倒排索引",
-                    evidence="LIKE '%...'"
-                ))
-            
-            # 检查 WHERE 子句中的函数
-            where_match = re.search(r'WHERE\s+([^;]+)', sql)
-            if where_match:
-                where_clause = where_match.group(1)
-                if re.search(r'[A-Z_]+\([^)]+\)', where_clause):
-                    problems.append(QueryProblem(
-                        problem_type=ProblemType.FUNCTION_IN_WHERE,
-                        severity="MEDIUM",
-                        description="WHERE 子句中使用函数可能导致索引失效",
-                        suggestion="将函数移到比较符号的另一侧，或使用计算列索引",
-                        evidence="WHERE 子句包含函数"
-                    ))
-            
-            # 检查是否缺少 WHERE 条件
-            has_where = 'WHERE' in sql
-            has_join = 'JOIN' in sql
-            is_select = sql.startswith('SELECT')
+        指纹相同（只有数字字面量不同）的 SQL 只分析一次；去重后的数量达到 parallel_min_batch 时分发到进程池。
+        
+        Args:
+            query_texts: SQL 文本列表
             
-            if is_select and not has_where and not has_join:
-                # 检查是否是简单的 SELECT COUNT(*) 或聚合查询
-                if not re.search(r'(COUNT|SUM|AVG|MAX|MIN)\(', sql):
-                    problems.append(QueryProblem(
-                        problem_type=ProblemType.NO_WHERE_CLAUSE,
-                        severity="HIGH",
-                        description="SELECT 查询缺少 WHERE 条件",
-                        suggestion="添加 WHERE 条件限制数据范围，避免全表扫描",
-                        evidence="缺少 WHERE 条件"
+        Returns:
+            与 query_texts 一一对应的问题元组
+        """
+        fingerprints = [_sql_fingerprint(text) for text in query_texts]
+        unique_texts = list(dict.fromkeys(fingerprints))
+        workers = self.parallel_workers or os.cpu_count() or 1
+        
+        results = None
+        if workers > 1 and len(unique_texts) >= self.parallel_min_batch:
+            try:
+                if self._reuse_pool:
+                    if self._executor is None:
+                        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=_MP_CONTEXT)
+                    results = list(self._executor.map(
+                        _analyze_sql_text, unique_texts, chunksize=_PARALLEL_CHUNK_SIZE
                     ))
-            
-            # 检查子查询
-            if re.search(r'FROM\s*\([^)]+SELECT', sql, re.IGNORECASE):
-                problems.append(QueryProblem(
-                    problem_type=ProblemType.SUBQUERY_INEFFICIENT,
-                    severity="MEDIUM",
-                    description="发现子查询，可能影响性能",
-                    suggestion="考虑使用 CTE (WITH 子句) 或 JOIN 替代子查询",
-                    evidence="发现子查询"
-                ))
+                else:
+                    with ProcessPoolExecutor(max_workers=workers, mp_context=_MP_CONTEXT) as executor:
+                        results = list(executor.map(
+                            _analyze_sql_text, unique_texts, chunksize=_PARALLEL_CHUNK_SIZE
+                        ))
+            except Exception as e:
+                logger.warning(f"多进程 SQL 结构分析失败，改为单进程执行: {str(e)}")
         
-        except Exception as e:
-            logger.warning(f"SQL 结构分析失败: {str(e)}")
+        if results is None:
+            results = [_analyze_sql_text(text) for text in unique_texts]
         
-        return problems
+        problems_by_text = dict(zip(unique_texts, results))
+        return [problems_by_text[text] for text in fingerprints]
     
     def _analyze_execution_plan(self, execution_plan: Dict) -> List[QueryProblem]:
         """分析执行计划"""
@@ -252,7 +463,7 @@ class QueryAnalyzer:
         if 'OLAP_SCAN' in plan_str or 'FULL_SCAN' in plan_str:
             problems.append(QueryProblem(
                 problem_type=ProblemType.FULL_TABLE_SCAN,
-                severity="MEDIUM",
+                severity=SEVERITY_MEDIUM,
                 description="执行计划显示可能存在全表扫描",
                 suggestion="检查是否可以利用索引或分区裁剪",
                 evidence="执行计划包含全表扫描"
@@ -270,28 +481,7 @@ class QueryAnalyzer:
         Returns:
             查询类型
         """
-        text = query_text.strip().upper()
-        
-        if text.startswith('SELECT'):
-            return QueryType.SELECT
-        elif text.startswith('INSERT'):
-            return QueryType.INSERT
-        elif text.startswith('UPDATE'):
-            return QueryType.UPDATE
-        elif text.startswith('DELETE'):
-            return QueryType.DELETE
-        elif text.startswith('CREATE'):
-            return QueryType.CREATE
-        elif text.startswith('ALTER'):
-            return QueryType.ALTER
-        elif text.startswith('DROP'):
-            return QueryType.DROP
-        elif text.startswith('SHOW'):
-            return QueryType.SHOW
-        elif text.startswith('EXPLAIN'):
-            return QueryType.EXPLAIN
-        else:
-            return QueryType.OTHER
+        return _get_query_type_cached(query_text)
     
     def extract_tables(self, query_text: str) -> List[str]:
         """
@@ -303,30 +493,121 @@ class QueryAnalyzer:
         Returns:
             表名列表
         """
-        tables = []
-        try:
-            parsed = sqlparse.parse(query_text)[0]
-            
-            keywords = ['FROM', 'JOIN', 'INTO', 'UPDATE', 'TABLE']
-            
-            for token in parsed.flatten():
-                if token.ttype is None and token.value.upper() in keywords:
-                    # 尝试获取下一个 token 作为表名
-                    continue
-            
-            # 简化的表名提取
-            text = query_text.upper()
-            for keyword in keywords:
-                pattern = rf'{keyword}\s+([^\s,;]+)'
-                matches = re.findall(pattern, text)
-                for match in matches:
-                    table = match.strip('`"[]')
-                    if table and table.upper() not in ['WHERE', 'ON', 'SELECT', 'AS']:
-                        tables.append(table)
-        
-        except Exception as e:
-            logger.warning(f"提取表名失败: {str(e)}")
-        
-        # 去重
-        return list(set(tables))
+        return list(_extract_tables_cached(query_text))
+
+
+# 同一批慢查询中常有大量重复 SQL，按 SQL 文本缓存解析结果（返回元组以保证缓存值不可变）
+
+@lru_cache(maxsize=_SQL_CACHE_SIZE)
+def _get_query_type_cached(query_text: str) -> QueryType:
+    """获取查询类型"""
+    match = _RE_LEADING_KEYWORD.match(query_text)
+    if not match:
+        return QueryType.OTHER
+    return _KEYWORD_TO_TYPE.get(match.group(1).upper(), QueryType.OTHER)
+
+
+@lru_cache(maxsize=_SQL_CACHE_SIZE)
+def _extract_tables_cached(query_text: str) -> Tuple[str, ...]:
+    """提取 SQL 中的表名"""
+    tables = []
+    
+    # 简化的表名提取
+    for pattern in _RE_TABLE_BY_KEYWORD:
+        matches = pattern.findall(query_text)
+        for match in matches:
+            table = match.strip('`"[]').upper()
+            if table and table not in _NOT_TABLE_NAMES:
+                tables.append(table)
+    
+    # 去重
+    return tuple(dict.fromkeys(tables))
+
 
+@lru_cache(maxsize=_SQL_CACHE_SIZE)
+def _sql_fingerprint(sql: str) -> str:
+    """将数字字面量替换为 ?，得到用于结构分析去重的 SQL 指纹"""
+    return _RE_NUMBER_LITERAL.sub('?', sql)
+
+
+@lru_cache(maxsize=_SQL_CACHE_SIZE)
+def _analyze_sql_text(sql: str) -> Tuple[QueryProblem, ...]:
+    """分析 SQL 结构（模块级函数，便于在进程池中执行）"""
+    problems = []
+    
+    flags = {match.lastgroup for match in _RE_STRUCTURE.finditer(sql)}
+    if 'like' in flags and not _RE_LIKE_PREFIX_WILDCARD.search(sql):
+        flags.discard('like')
+    if 'from' in flags and _RE_SUBQUERY.search(sql):
+        flags.add('sub')
+    if 'where' in flags and _RE_FUNCTION_IN_WHERE.search(sql):
+        flags.add('func')
+    
+    # 检查 SELECT *
+    if 'star' in flags:
+        problems.append(QueryProblem(
+            problem_type=ProblemType.SELECT_STAR,
+            severity=SEVERITY_MEDIUM,
+            description="使用 SELECT * 可能会返回不必要的列",
+            suggestion="明确指定需要的列，减少数据传输和内存使用",
+            evidence="SELECT *"
+        ))
+    
+    has_where = 'where' in flags
+    has_join = 'join' in flags
+    
+    # 检查 OR 条件
+    if 'or' in flags and has_where:
+        problems.append(QueryProblem(
+            problem_type=ProblemType.OR_CONDITION,
+            severity=SEVERITY_LOW,
+            description="使用 OR 条件可能导致索引失效",
+            suggestion="考虑使用 UNION ALL 代替 OR，或优化查询逻辑",
+            evidence="发现 OR 条件"
+        ))
+    
+    # 检查 LIKE 前缀通配符
+    if 'like' in flags:
+        problems.append(QueryProblem(
+            problem_type=ProblemType.LIKE_PREFIX_WILDCARD,
+            severity=SEVERITY_HIGH,
+            description="LIKE 使用前缀通配符 %... 无法使用索引",
+            suggestion="避免前缀通配符，考虑使用全文索引或倒排索引",
+            evidence="LIKE '%...'"
+        ))
+    
+    # 检查 WHERE 子句中的函数
+    if 'func' in flags:
+        problems.append(QueryProblem(
+            problem_type=ProblemType.FUNCTION_IN_WHERE,
+            severity=SEVERITY_MEDIUM,
+            description="WHERE 子句中使用函数可能导致索引失效",
+            suggestion="将函数移到比较符号的另一侧，或使用计算列索引",
+            evidence="WHERE 子句包含函数"
+        ))
+    
+    # 检查是否缺少 WHERE 条件
+    is_select = sql[:6].upper() == 'SELECT'
+    
+    if is_select and not has_where and not has_join:
+        # 检查是否是简单的 SELECT COUNT(*) 或聚合查询
+        if 'agg' not in flags:
+            problems.append(QueryProblem(
+                problem_type=ProblemType.NO_WHERE_CLAUSE,
+                severity=SEVERITY_HIGH,
+                description="SELECT 查询缺少 WHERE 条件",
+                suggestion="添加 WHERE 条件限制数据范围，避免全表扫描",
+                evidence="缺少 WHERE 条件"
+            ))
+    
+    # 检查子查询
+    if 'sub' in flags:
+        problems.append(QueryProblem(
+            problem_type=ProblemType.SUBQUERY_INEFFICIENT,
+            severity=SEVERITY_MEDIUM,
+            description="发现子查询，可能影响性能",
+            suggestion="考虑使用 CTE (WITH 子句) 或 JOIN 替代子查询",
+            evidence="发现子查询"
+        ))
+    
+    return tuple(problems)
@@ -5,17 +5,194 @@
 生成慢 SQL 分析报告（HTML、Markdown、JSON 格式）
 """
 
+import gzip
+import hashlib
+import io
 import json
 import os
-from datetime import datetime
-from typing import List, Dict, Any, Optional
-from dataclasses import asdict
-from jinja2 import Template
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import List, Dict, Any, Iterable, Optional, Sequence, Tuple, Union
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from markupsafe import Markup
 import logging
 
-logging.basicConfig(level=logging.INFO)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# 数据类在 Python 3.10+ 上使用 __slots__，减少每个实例的内存占用
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+# 报告中展示详情的慢查询条数
+_TOP_QUERY_LIMIT = 20
+
+# 严重程度 / 优先级到 CSS 类名后缀的映射，避免在模板循环中逐个调用 lower()
+_SEVERITY_CSS = {s: s.lower() for s in ("CRITICAL", "HIGH", "MEDIUM", "LOW")}
+
+# 写报告文件的缓冲区大小，减少大报告写入时的系统调用次数
+_WRITE_BUFFER_SIZE = 1024 * 1024
+
+# HTML 报告模板所在目录
+_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+# HTML 模板的编译参数，trim_blocks/lstrip_blocks 去掉控制块所在行的空白，减少输出节点
+_JINJA_OPTIONS = {
+    'autoescape': True,
+    'trim_blocks': True,
+    'lstrip_blocks': True,
+    'optimized': True,
+}
+
+# 压缩样式表用的正则
+_RE_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_RE_CSS_SPACE = re.compile(r'\s+')
+_RE_CSS_PUNCT_SPACE = re.compile(r'\s*([{}:;,>])\s*')
+
+
+@lru_cache(maxsize=None)
+def _get_html_template():
+    """
+    加载 HTML 报告模板，每个进程只加载一次
+
+    编译结果通过字节码缓存保存在临时目录中，新进程首次生成报告时无需重新解析模板；
+    模板随程序发布，不会在运行期间修改，因此关闭 auto_reload 省去每次渲染前的 stat。
+    """
+    # 字节码缓存的键只包含模板名和源码，不包含环境参数，因此把参数摘要放进缓存文件名，
+    # 修改参数后不会读到按旧参数编译的缓存
+    options_digest = hashlib.sha1(repr(sorted(_JINJA_OPTIONS.items())).encode('utf-8')).hexdigest()[:12]
+    env = Environment(
+        loader=FileSystemLoader(_TEMPLATE_DIR),
+        bytecode_cache=FileSystemBytecodeCache(pattern=f'__jinja2_report_{options_digest}_%s.cache'),
+        auto_reload=False,
+        **_JINJA_OPTIONS
+    )
+    # 样式表单独维护，加载时压缩一次后内联到报告中，报告仍是单个自包含文件
+    with open(os.path.join(_TEMPLATE_DIR, 'report.css'), 'r', encoding='utf-8') as f:
+        env.globals['report_css'] = Markup(_minify_css(f.read()))
+    env.globals['severity_css'] = _SEVERITY_CSS
+    return env.get_template('report.html')
+
+
+def _minify_css(css: str) -> str:
+    """去掉样式表中的注释和多余空白"""
+    css = _RE_CSS_COMMENT.sub('', css)
+    css = _RE_CSS_SPACE.sub(' ', css)
+    css = _RE_CSS_PUNCT_SPACE.sub(r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
+class _QueryView:
+    """报告中单条慢查询的视图模型，展示用字段预先格式化，各报告格式共用"""
+    query: Any
+    query_id: str
+    query_text: str
+    database: str
+    user: str
+    severity: str
+    severity_css: str
+    execution_time_str: str
+    scan_rows_str: str
+    scan_bytes_str: str
+    memory_mb_str: str
+    problems: Sequence
+    suggestions: Sequence
+
+
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
+class _StatisticsView:
+    """统计概览的视图模型，数值预先格式化，模板中不再调用格式化过滤器"""
+    total_queries: int
+    avg_execution_time_str: str
+    max_execution_time_str: str
+    total_scan_rows_str: str
+    severity_rows: List[Tuple[str, str, int]]
+
+
+def _build_statistics_view(statistics: Dict[str, Any]) -> _StatisticsView:
+    """根据统计信息字典构造统计概览视图模型"""
+    return _StatisticsView(
+        total_queries=statistics['total_queries'],
+        avg_execution_time_str=f"{statistics['avg_execution_time']:.2f}",
+        max_execution_time_str=f"{statistics['max_execution_time']:.2f}",
+        total_scan_rows_str=f"{statistics['total_scan_rows']:,}",
+        severity_rows=[
+            (severity, _SEVERITY_CSS.get(severity, 'low'), count)
+            for severity, count in statistics['severity_distribution'].items()
+        ]
+    )
+
+
+def _build_view_models(
+    slow_queries: Iterable,
+    problems_by_query: Dict[str, List],
+    suggestions_by_query: Dict[str, List]
+) -> List[_QueryView]:
+    """
+    构造慢查询视图模型
+
+    Args:
+        slow_queries: 慢查询列表
+        problems_by_query: 按查询ID分组的问题
+        suggestions_by_query: 按查询ID分组的建议
+
+    Returns:
+        与 slow_queries 一一对应的视图模型列表（没有分析结果的查询，problems/suggestions 为空元组）
+    """
+    view_models = []
+    for query in slow_queries:
+        severity = query.severity
+        query_id = query.query_id
+        view_models.append(_QueryView(
+            query=query,
+            query_id=query_id,
+            query_text=query.query_text,
+            database=query.database,
+            user=query.user,
+            severity=severity,
+            severity_css=_SEVERITY_CSS.get(severity, 'low'),
+            execution_time_str=f"{query.execution_time:.2f}",
+            scan_rows_str=query.scan_rows_formatted,
+            scan_bytes_str=query.scan_bytes_formatted,
+            memory_mb_str=f"{query.memory_used / 1048576:.2f}",
+            problems=problems_by_query.get(query_id, ()),
+            suggestions=suggestions_by_query.get(query_id, ())
+        ))
+    return view_models
+
+
+def _build_summary_rows(suggestions_by_query: Dict[str, List]) -> List[Tuple[str, str, str, str, str]]:
+    """
+    展开建议汇总表的行
+
+    Args:
+        suggestions_by_query: 按查询ID分组的建议
+
+    Returns:
+        (优先级, 优先级样式名, 类别, 标题, 预期提升) 列表
+    """
+    return [
+        (s.priority, _SEVERITY_CSS.get(s.priority, 'low'), s.category, s.title, s.estimated_improvement or '未知')
+        for suggestions in suggestions_by_query.values()
+        for s in suggestions
+    ]
+
+
+def _json_default(obj):
+    """序列化 JSON 无法直接处理的对象（标准库 json 的日期时间、orjson 的日期时间子类）"""
+    if isinstance(obj, date):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
 
 class ReportGenerator:
     """报告生成器"""
@@ -30,9 +207,60 @@ class ReportGenerator:
         self.config = config or {}
         self.report_dir = self.config.get('report_dir', './reports')
         self.report_format = self.config.get('report_format', 'html')
+        self.compress = self.config.get('compress', False)
+        self.json_indent = self.config.get('json_indent')
         
-        # 创建报告目录
-        os.makedirs(self.report_dir, exist_ok=True)
+        # 报告格式到生成方法的分派表
+        self._generators = {
+            'html': self._generate_html_report,
+            'markdown': self._generate_markdown_report,
+            'json': self._generate_json_report,
+        }
+    
+    @property
+    def report_dir(self) -> str:
+        """报告输出目录"""
+        return self._report_dir
+    
+    @report_dir.setter
+    def report_dir(self, value: str):
+        self._report_dir = value
+        # 预先拼好文件名模板，生成报告时只需填入时间戳和扩展名
+        escaped_dir = value.replace('{', '{{').replace('}', '}}')
+        self._filename_template = os.path.join(escaped_dir, 'slow_query_report_{ts}.{ext}')
+    
+    def _report_filename(self, timestamp: str, ext: str) -> str:
+        """
+        返回报告文件路径
+        
+        Args:
+            timestamp: 报告时间戳
+            ext: 文件扩展名
+            
+        Returns:
+            报告文件路径
+        """
+        return self._filename_template.format(ts=timestamp, ext=ext)
+    
+    def _open_report(self, filename: str, opener=open, *args, **kwargs):
+        """
+        打开报告文件用于写入
+        
+        报告目录已存在时直接打开，不额外调用 os.makedirs；目录尚未创建或已被删除时创建后重试。
+        
+        Args:
+            filename: 报告文件路径
+            opener: 打开文件的函数（open 或 gzip.open）
+            *args, **kwargs: 传给 opener 的参数
+            
+        Returns:
+            文件对象
+        """
+        try:
+            return opener(filename, *args, **kwargs)
+        except FileNotFoundError:
+            os.makedirs(self._report_dir, exist_ok=True)
+            return opener(filename, *args, **kwargs)
     
     def generate_report(
         self,
@@ -41,10 +269,13 @@ class ReportGenerator:
         problems_by_query: Dict[str, List],
         suggestions_by_query: Dict[str, List],
         metadata: Optional[Dict[str, Any]] = None
-    ) -> str:
+    ) -> Union[str, List[str]]:
         """
         生成分析报告
         
+        report_format 为列表时一次生成多种格式，各格式在线程池中并行渲染和写入；
+        重复的格式只生成一次，避免多个线程同时写同一个文件。
+        
         Args:
             slow_queries: 慢查询列表
             statistics: 统计信息
@@ -53,567 +284,173 @@ class ReportGenerator:
             metadata: 元数据（时间范围等）
             
         Returns:
-            报告文件路径
+            报告文件路径；report_format 为列表时返回按去重后的格式顺序排列的路径列表
         """
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        if self.report_format == 'html':
-            return self._generate_html_report(
-                slow_queries, statistics, problems_by_query, 
-                suggestions_by_query, metadata, timestamp
-            )
-        elif self.report_format == 'markdown':
-            return self._generate_markdown_report(
-                slow_queries, statistics, problems_by_query,
-                suggestions_by_query, metadata, timestamp
-            )
-        elif self.report_format == 'json':
-            return self._generate_json_report(
-                slow_queries, statistics, problems_by_query,
-                suggestions_by_query, metadata, timestamp
-            )
-        else:
-            raise ValueError(f"不支持的报告格式: {self.report_format}")
+        formats = [self.report_format] if isinstance(self.report_format, str) else list(dict.fromkeys(self.report_format))
+        for fmt in formats:
+            if fmt not in self._generators:
+                raise ValueError(f"不支持的报告格式: {fmt}")
+        
+        # 同一次生成的各处时间保持一致
+        now = datetime.now()
+        timestamp = now.strftime('%Y%m%d_%H%M%S')
+        
+        # 只有 JSON 报告需要全部慢查询，HTML/Markdown 只展示前 _TOP_QUERY_LIMIT 条
+        if 'json' not in formats:
+            slow_queries = islice(slow_queries, _TOP_QUERY_LIMIT)
+        view_models = _build_view_models(slow_queries, problems_by_query, suggestions_by_query)
+        summary_rows = _build_summary_rows(suggestions_by_query)
+        args = (view_models, statistics, summary_rows, metadata, now, timestamp)
+        
+        if isinstance(self.report_format, str):
+            return self._generators[self.report_format](*args)
+        
+        # 渲染与写文件交错进行，写入和 C 扩展序列化期间会释放 GIL
+        with ThreadPoolExecutor(max_workers=max(len(formats), 1)) as executor:
+            futures = [executor.submit(self._generators[fmt], *args) for fmt in formats]
+            return [future.result() for future in futures]
     
     def _generate_html_report(
         self,
-        slow_queries: List,
+        view_models: List[_QueryView],
         statistics: Dict[str, Any],
-        problems_by_query: Dict[str, List],
-        suggestions_by_query: Dict[str, List],
+        summary_rows: List[Tuple[str, str, str, str, str]],
         metadata: Optional[Dict[str, Any]],
+        now: datetime,
         timestamp: str
     ) -> str:
         """生成 HTML 报告"""
-        
-        html_template = Template('''
-<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>StarRocks 慢 SQL 分析报告</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-        
-        body {
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
-            line-height: 1.6;
-            color: #333;
-            background: #f5f5f5;
-            padding: 20px;
-        }
-        
-        .container {
-            max-width: 1400px;
-            margin: 0 auto;
-            background: white;
-            padding: 30px;
-            border-radius: 8px;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-        }
-        
-        h1 {
-            color: #2c3e50;
-            border-bottom: 3px solid #3498db;
-            padding-bottom: 15px;
-            margin-bottom: 30px;
-        }
-        
-        h2 {
-            color: #34495e;
-            margin-top: 30px;
-            margin-bottom: 20px;
-            border-left: 4px solid #3498db;
-            padding-left: 15px;
-        }
-        
-        h3 {
-            color: #555;
-            margin-top: 20px;
-            margin-bottom: 15px;
-        }
-        
-        .metadata {
-            background: #ecf0f1;
-            padding: 15px;
-            border-radius: 5px;
-            margin-bottom: 30px;
-        }
-        
-        .metadata p {
-            margin: 5px 0;
-        }
-        
-        .stats-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-            gap: 20px;
-            margin-bottom: 30px;
-        }
-        
-        .stat-card {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            padding: 20px;
-            border-radius: 8px;
-            text-align: center;
-        }
-        
-        .stat-card h3 {
-            color: white;
-            margin-bottom: 10px;
-        }
-        
-        .stat-card .value {
-            font-size: 2em;
-            font-weight: bold;
-        }
-        
-        .severity-critical { background: linear-gradient(135deg, #e74c3c 0%, #c0392b 100%); }
-        .severity-high { background: linear-gradient(135deg, #f39c12 0%, #d35400 100%); }
-        .severity-medium { background: linear-gradient(135deg, #3498db 0%, #2980b9 100%); }
-        .severity-low { background: linear-gradient(135deg, #27ae60 0%, #229954 100%); }
-        
-        .query-card {
-            background: #f8f9fa;
-            border: 1px solid #e9ecef;
-            border-radius: 8px;
-            padding: 20px;
-            margin-bottom: 20px;
-        }
-        
-        .query-header {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: 15px;
-        }
-        
-        .query-id {
-            font-family: monospace;
-            color: #666;
-            font-size: 0.9em;
-        }
-        
-        .severity-badge {
-            padding: 5px 15px;
-            border-radius: 20px;
-            color: white;
-            font-weight: bold;
-            font-size: 0.85em;
-        }
-        
-        .severity-critical { background: #e74c3c; }
-        .severity-high { background: #f39c12; }
-        .severity-medium { background: #3498db; }
-        .severity-low { background: #27ae60; }
-        
-        .sql-box {
-            background: #282c34;
-            color: #abb2bf;
-            padding: 15px;
-            border-radius: 5px;
-            overflow-x: auto;
-            margin: 15px 0;
-            font-family: 'Fira Code', 'Consolas', monospace;
-            font-size: 0.9em;
-        }
-        
-        .metrics {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(150px, 1fr));
-            gap: 10px;
-            margin: 15px 0;
-        }
-        
-        .metric {
-            background: white;
-            padding: 10px;
-            border-radius: 5px;
-            text-align: center;
-        }
-        
-        .metric-label {
-            color: #666;
-            font-size: 0.85em;
-        }
-        
-        .metric-value {
-            color: #2c3e50;
-            font-weight: bold;
-            font-size: 1.1em;
-        }
-        
-        .problem-list, .suggestion-list {
-            margin-top: 15px;
-        }
-        
-        .problem-item {
-            background: #fff3cd;
-            border-left: 4px solid #ffc107;
-            padding: 10px 15px;
-            margin-bottom: 10px;
-            border-radius: 3px;
-        }
-        
-        .problem-item.high {
-            background: #f8d7da;
-            border-left-color: #dc3545;
-        }
-        
-        .suggestion-item {
-            background: #d1ecf1;
-            border-left: 4px solid #17a2b8;
-            padding: 10px 15px;
-            margin-bottom: 10px;
-            border-radius: 3px;
-        }
-        
-        table {
-            width: 100%;
-            border-collapse: collapse;
-            margin: 20px 0;
-        }
-        
-        th, td {
-            padding: 12px;
-            text-align: left;
-            border-bottom: 1px solid #ddd;
-        }
-        
-        th {
-            background: #3498db;
-            color: white;
-            font-weight: bold;
-        }
-        
-        tr:hover {
-            background: #f5f5f5;
-        }
-        
-        .priority-high {
-            color: #e74c3c;
-            font-weight: bold;
-        }
-        
-        .priority-medium {
-            color: #f39c12;
-            font-weight: bold;
-        }
-        
-        .priority-low {
-            color: #27ae60;
-            font-weight: bold;
-        }
-        
-        .footer {
-            margin-top: 50px;
-            padding-top: 20px;
-            border-top: 2px solid #ecf0f1;
-            text-align: center;
-            color: #7f8c8d;
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>🐘 StarRocks 慢 SQL 分析报告</h1>
-        
-        <div class="metadata">
-            <p><strong>报告生成时间:</strong> {{ report_time }}</p>
-            <p><strong>分析时间范围:</strong> {{ metadata.time_range }} 小时</p>
-            <p><strong>慢查询阈值:</strong> {{ metadata.threshold }} 秒</p>
-            {% if metadata.database %}
-            <p><strong>分析数据库:</strong> {{ metadata.database }}</p>
-            {% endif %}
-        </div>
-        
-        <h2>📊 统计概览</h2>
-        <div class="stats-grid">
-            <div class="stat-card">
-                <h3>总慢查询数</h3>
-                <div class="value">{{ statistics.total_queries }}</div>
-            </div>
-            <div class="stat-card">
-                <h3>平均执行时间</h3>
-                <div class="value">{{ "%.2f"|format(statistics.avg_execution_time) }}s</div>
-            </div>
-            <div class="stat-card">
-                <h3>最大执行时间</h3>
-                <div class="value">{{ "%.2f"|format(statistics.max_execution_time) }}s</div>
-            </div>
-            <div class="stat-card">
-                <h3>总扫描行数</h3>
-                <div class="value">{{ "{:,}".format(statistics.total_scan_rows) }}</div>
-            </div>
-        </div>
-        
-        <h2>📈 严重程度分布</h2>
-        <div class="stats-grid">
-            {% for severity, count in statistics.severity_distribution.items() %}
-            <div class="stat-card severity-{{ severity.lower() }}">
-                <h3>{{ severity }}</h3>
-                <div class="value">{{ count }}</div>
-            </div>
-            {% endfor %}
-        </div>
-        
-        <h2>🔍 慢查询详情</h2>
-        {% for query in slow_queries[:20] %}
-        <div class="query-card">
-            <div class="query-header">
-                <div>
-                    <span class="query-id">Query ID: {{ query.query_id }}</span>
-                    <br>
-                    <small>数据库: {{ query.database }} | 用户: {{ query.user }}</small>
-                </div>
-                <span class="severity-badge severity-{{ query.severity.lower() }}">
-                    {{ query.severity }}
-                </span>
-            </div>
-            
-            <div class="sql-box">{{ query.query_text }}</div>
-            
-            <div class="metrics">
-                <div class="metric">
-                    <div class="metric-label">执行时间</div>
-                    <div class="metric-value">{{ "%.2f"|format(query.execution_time) }}s</div>
-                </div>
-                <div class="metric">
-                    <div class="metric-label">扫描行数</div>
-                    <div class="metric-value">{{ query.scan_rows_formatted }}</div>
-                </div>
-                <div class="metric">
-                    <div class="metric-label">扫描字节数</div>
-                    <div class="metric-value">{{ query.scan_bytes_formatted }}</div>
-                </div>
-                <div class="metric">
-                    <div class="metric-label">内存使用</div>
-                    <div class="metric-value">{{ "{:.2f}".format(query.memory_used / 1048576) }} MB</div>
-                </div>
-            </div>
-            
-            {% if query.query_id in problems_by_query %}
-            <h3>⚠️ 发现的问题</h3>
-            <div class="problem-list">
-                {% for problem in problems_by_query[query.query_id] %}
-                <div class="problem-item {{ 'high' if problem.severity in ['CRITICAL', 'HIGH'] else '' }}">
-                    <strong>{{ problem.problem_type.value }}</strong> 
-                    <span class="priority-{{ problem.severity.lower() }}">[{{ problem.severity }}]</span>
-                    <p>{{ problem.description }}</p>
-                    <p><strong>建议:</strong> {{ problem.suggestion }}</p>
-                </div>
-                {% endfor %}
-            </div>
-            {% endif %}
-            
-            {% if query.query_id in suggestions_by_query %}
-            <h3>💡 优化建议</h3>
-            <div class="suggestion-list">
-                {% for suggestion in suggestions_by_query[query.query_id] %}
-                <div class="suggestion-item">
-                    <strong>{{ suggestion.title }}</strong> 
-                    <span class="priority-{{ suggestion.priority.lower() }}">[{{ suggestion.priority }}]</span>
-                    <p>{{ suggestion.description }}</p>
-                    {% if suggestion.suggested_sql %}
-                    <div class="sql-box">{{ suggestion.suggested_sql }}</div>
-                    {% endif %}
-                    {% if suggestion.estimated_improvement %}
-                    <p><strong>预期提升:</strong> {{ suggestion.estimated_improvement }}</p>
-                    {% endif %}
-                    {% if suggestion.implementation_notes %}
-                    <p><strong>实施说明:</strong> {{ suggestion.implementation_notes }}</p>
-                    {% endif %}
-                </div>
-                {% endfor %}
-            </div>
-            {% endif %}
-        </div>
-        {% endfor %}
-        
-        <h2>📋 优化建议汇总</h2>
-        <table>
-            <thead>
-                <tr>
-                    <th>优先级</th>
-                    <th>类别</th>
-                    <th>标题</th>
-                    <th>预期提升</th>
-                </tr>
-            </thead>
-            <tbody>
-                {% for query_id, suggestions in suggestions_by_query.items() %}
-                {% for suggestion in suggestions %}
-                <tr>
-                    <td class="priority-{{ suggestion.priority.lower() }}">{{ suggestion.priority }}</td>
-                    <td>{{ suggestion.category }}</td>
-                    <td>{{ suggestion.title }}</td>
-                    <td>{{ suggestion.estimated_improvement or '未知' }}</td>
-                </tr>
-                {% endfor %}
-                {% endfor %}
-            </tbody>
-        </table>
-        
-        <div class="footer">
-            <p>📅 生成于: {{ report_time }} | 🔧 StarRocks 慢 SQL 分析工具</p>
-        </div>
-    </div>
-</body>
-</html>
-        ''')
-        
-        html_content = html_template.render(
-            report_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        # 切片在 Python 中完成，模板只做简单的单层循环
+        html_stream = _get_html_template().stream(
+            report_time=now.strftime('%Y-%m-%d %H:%M:%S'),
             metadata=metadata or {},
-            statistics=statistics,
-            slow_queries=slow_queries,
-            problems_by_query=problems_by_query,
-            suggestions_by_query=suggestions_by_query
+            statistics=_build_statistics_view(statistics),
+            top_queries=islice(view_models, _TOP_QUERY_LIMIT),
+            summary_rows=summary_rows
         )
         
-        filename = os.path.join(self.report_dir, f'slow_query_report_{timestamp}.html')
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        # 边渲染边写入文件，不在内存中拼出完整的 HTML
+        filename = self._report_filename(timestamp, 'html')
+        if self.compress:
+            # 压缩级别 1 的 CPU 开销最低，重复的标签和样式仍能压缩到原来的几分之一
+            filename += '.gz'
+            with self._open_report(filename, gzip.open, 'wb', compresslevel=1) as f:
+                html_stream.dump(f, encoding='utf-8')
+        else:
+            with self._open_report(filename, open, 'wb', buffering=_WRITE_BUFFER_SIZE) as f:
+                html_stream.dump(f, encoding='utf-8')
         
         logger.info(f"HTML 报告已生成: {filename}")
         return filename
     
     def _generate_markdown_report(
         self,
-        slow_queries: List,
+        view_models: List[_QueryView],
         statistics: Dict[str, Any],
-        problems_by_query: Dict[str, List],
-        suggestions_by_query: Dict[str, List],
+        summary_rows: List[Tuple[str, str, str, str, str]],
         metadata: Optional[Dict[str, Any]],
+        now: datetime,
         timestamp: str
     ) -> str:
         """生成 Markdown 报告"""
         
-        md_lines = [
-            "# 🐘 StarRocks 慢 SQL 分析报告\n",
-            "## 📋 报告元数据",
-            f"- **报告生成时间**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
-            f"- **分析时间范围**: {metadata.get('time_range', 24)} 小时",
-            f"- **慢查询阈值**: {metadata.get('threshold', 1.0)} 秒",
-        ]
+        report_time = now.strftime('%Y-%m-%d %H:%M:%S')
+        buf = io.StringIO()
+        w = buf.write
+        
+        # 每行以换行结尾，最后一行除外（与逐行拼接后 '\n'.join 的输出一致）
+        w("# 🐘 StarRocks 慢 SQL 分析报告\n\n")
+        w("## 📋 报告元数据\n")
+        w(f"- **报告生成时间**: {report_time}\n")
+        w(f"- **分析时间范围**: {metadata.get('time_range', 24)} 小时\n")
+        w(f"- **慢查询阈值**: {metadata.get('threshold', 1.0)} 秒\n")
         
         if metadata and metadata.get('database'):
-            md_lines.append(f"- **分析数据库**: {metadata['database']}")
+            w(f"- **分析数据库**: {metadata['database']}\n")
         
-        md_lines.extend([
-            "",
-            "## 📊 统计概览",
-            f"- **总慢查询数**: {statistics['total_queries']}",
-            f"- **平均执行时间**: {statistics['avg_execution_time']:.2f}s",
-            f"- **最大执行时间**: {statistics['max_execution_time']:.2f}s",
-            f"- **总扫描行数**: {statistics['total_scan_rows']:,}",
-            "",
-            "## 📈 严重程度分布",
-        ])
+        w("\n")
+        w("## 📊 统计概览\n")
+        w(f"- **总慢查询数**: {statistics['total_queries']}\n")
+        w(f"- **平均执行时间**: {statistics['avg_execution_time']:.2f}s\n")
+        w(f"- **最大执行时间**: {statistics['max_execution_time']:.2f}s\n")
+        w(f"- **总扫描行数**: {statistics['total_scan_rows']:,}\n")
+        w("\n")
+        w("## 📈 严重程度分布\n")
         
         for severity, count in statistics['severity_distribution'].items():
-            md_lines.append(f"- **{severity}**: {count}")
-        
-        md_lines.extend([
-            "",
-            "## 🔍 慢查询详情",
-        ])
-        
-        for i, query in enumerate(slow_queries[:20], 1):
-            md_lines.extend([
-                f"\n### {i}. Query ID: `{query.query_id}`",
-                f"**数据库**: {query.database} | **用户**: {query.user} | **严重程度**: {query.severity}",
-                "",
-                "#### SQL",
-                f"```sql\n{query.query_text}\n```",
-                "",
-                "#### 性能指标",
-                f"- 执行时间: {query.execution_time:.2f}s",
-                f"- 扫描行数: {query.scan_rows_formatted}",
-                f"- 扫描字节数: {query.scan_bytes_formatted}",
-                f"- 内存使用: {query.memory_used / 1048576:.2f} MB",
-            ])
+            w(f"- **{severity}**: {count}\n")
+        
+        w("\n")
+        w("## 🔍 慢查询详情\n")
+        
+        for i, query in enumerate(islice(view_models, _TOP_QUERY_LIMIT), 1):
+            w(f"\n### {i}. Query ID: `{query.query_id}`\n")
+            w(f"**数据库**: {query.database} | **用户**: {query.user} | **严重程度**: {query.severity}\n")
+            w("\n")
+            w("#### SQL\n")
+            w(f"```sql\n{query.query_text}\n```\n")
+            w("\n")
+            w("#### 性能指标\n")
+            w(f"- 执行时间: {query.execution_time_str}s\n")
+            w(f"- 扫描行数: {query.scan_rows_str}\n")
+            w(f"- 扫描字节数: {query.scan_bytes_str}\n")
+            w(f"- 内存使用: {query.memory_mb_str} MB\n")
             
-            if query.query_id in problems_by_query:
-                md_lines.append("\n#### ⚠️ 发现的问题")
-                for problem in problems_by_query[query.query_id]:
-                    md_lines.extend([
-                        f"- **{problem.problem_type.value}** [{problem.severity}]",
-                        f"  - {problem.description}",
-                        f"  - 建议: {problem.suggestion}",
-                    ])
+            if query.problems:
+                w("\n#### ⚠️ 发现的问题\n")
+                for problem in query.problems:
+                    w(f"- **{problem.problem_type.value}** [{problem.severity}]\n")
+                    w(f"  - {problem.description}\n")
+                    w(f"  - 建议: {problem.suggestion}\n")
             
-            if query.query_id in suggestions_by_query:
-                md_lines.append("\n#### 💡 优化建议")
-                for suggestion in suggestions_by_query[query.query_id]:
-                    md_lines.extend([
-                        f"- **{suggestion.title}** [{suggestion.priority}]",
-                        f"  - {suggestion.description}",
-                    ])
+            if query.suggestions:
+                w("\n#### 💡 优化建议\n")
+                for suggestion in query.suggestions:
+                    w(f"- **{suggestion.title}** [{suggestion.priority}]\n")
+                    w(f"  - {suggestion.description}\n")
                     if suggestion.suggested_sql:
-                        md_lines.append(f"  ```sql\n  {suggestion.suggested_sql}\n  ```")
+                        w(f"  ```sql\n  {suggestion.suggested_sql}\n  ```\n")
                     if suggestion.estimated_improvement:
-                        md_lines.append(f"  - 预期提升: {suggestion.estimated_improvement}")
+                        w(f"  - 预期提升: {suggestion.estimated_improvement}\n")
                     if suggestion.implementation_notes:
-                        md_lines.append(f"  - 实施说明: {suggestion.implementation_notes}")
+                        w(f"  - 实施说明: {suggestion.implementation_notes}\n")
         
-        md_lines.extend([
-            "\n## 📋 优化建议汇总",
-            "\n| 优先级 | 类别 | 标题 | 预期提升 |",
-            "|--------|------|------|----------|",
-        ])
+        w("\n## 📋 优化建议汇总\n")
+        w("\n| 优先级 | 类别 | 标题 | 预期提升 |\n")
+        w("|--------|------|------|----------|\n")
         
-        for query_id, suggestions in suggestions_by_query.items():
-            for suggestion in suggestions:
-                md_lines.append(
-                    f"| {suggestion.priority} | {suggestion.category} | {suggestion.title} | {suggestion.estimated_improvement or '未知'} |"
-                )
+        for priority, _, category, title, improvement in summary_rows:
+            w(f"| {priority} | {category} | {title} | {improvement} |\n")
         
-        md_lines.extend([
-            "",
-            "---",
-            f"\n📅 生成于: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | 🔧 StarRocks 慢 SQL 分析工具\n"
-        ])
+        w("\n")
+        w("---\n")
+        w(f"\n📅 生成于: {report_time} | 🔧 StarRocks 慢 SQL 分析工具\n")
         
-        md_content = '\n'.join(md_lines)
-        filename = os.path.join(self.report_dir, f'slow_query_report_{timestamp}.md')
+        md_content = buf.getvalue()
+        filename = self._report_filename(timestamp, 'md')
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(md_content)
+        with self._open_report(filename, open, 'wb', buffering=_WRITE_BUFFER_SIZE) as f:
+            f.write(md_content.encode('utf-8'))
         
         logger.info(f"Markdown 报告已生成: {filename}")
         return filename
     
     def _generate_json_report(
         self,
-        slow_queries: List,
+        view_models: List[_QueryView],
         statistics: Dict[str, Any],
-        problems_by_query: Dict[str, List],
-        suggestions_by_query: Dict[str, List],
+        summary_rows: List[Tuple[str, str, str, str, str]],
         metadata: Optional[Dict[str, Any]],
+        now: datetime,
         timestamp: str
     ) -> str:
         """生成 JSON 报告"""
+        slow_queries_data = []
+        append = slow_queries_data.append
         
-        report_data = {
-            "metadata": {
-                "report_time": datetime.now().isoformat(),
-                "time_range_hours": metadata.get('time_range', 24) if metadata else 24,
-                "threshold_seconds": metadata.get('threshold', 1.0) if metadata else 1.0,
-                "database": metadata.get('database') if metadata else None,
-            },
-            "statistics": statistics,
-            "slow_queries": [],
-        }
-        
-        for query in slow_queries:
-            query_data = {
+        for view in view_models:
+            query = view.query
+            append({
                 "query_id": query.query_id,
                 "query_text": query.query_text,
                 "database": query.database,
@@ -623,26 +460,21 @@ class ReportGenerator:
                 "scan_bytes": query.scan_bytes,
                 "memory_used": query.memory_used,
                 "cpu_time": query.cpu_time,
-                "start_time": query.start_time.isoformat(),
-                "end_time": query.end_time.isoformat(),
-                "severity": query.severity,
-                "problems": [],
-                "suggestions": []
-            }
-            
-            if query.query_id in problems_by_query:
-                for problem in problems_by_query[query.query_id]:
-                    query_data["problems"].append({
+                "start_time": query.start_time,
+                "end_time": query.end_time,
+                "severity": view.severity,
+                "problems": [
+                    {
                         "type": problem.problem_type.value,
                         "severity": problem.severity,
                         "description": problem.description,
                         "suggestion": problem.suggestion,
                         "evidence": problem.evidence
-                    })
-            
-            if query.query_id in suggestions_by_query:
-                for suggestion in suggestions_by_query[query.query_id]:
-                    query_data["suggestions"].append({
+                    }
+                    for problem in view.problems
+                ],
+                "suggestions": [
+                    {
                         "title": suggestion.title,
                         "description": suggestion.description,
                         "priority": suggestion.priority,
@@ -650,14 +482,37 @@ class ReportGenerator:
                         "suggested_sql": suggestion.suggested_sql,
                         "estimated_improvement": suggestion.estimated_improvement,
                         "implementation_notes": suggestion.implementation_notes
-                    })
-            
-            report_data["slow_queries"].append(query_data)
+                    }
+                    for suggestion in view.suggestions
+                ]
+            })
         
-        filename = os.path.join(self.report_dir, f'slow_query_report_{timestamp}.json')
+        report_data = {
+            "metadata": {
+                "report_time": now,
+                "time_range_hours": metadata.get('time_range', 24) if metadata else 24,
+                "threshold_seconds": metadata.get('threshold', 1.0) if metadata else 1.0,
+                "database": metadata.get('database') if metadata else None,
+            },
+            "statistics": statistics,
+            "slow_queries": slow_queries_data,
+        }
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(report_data, f, ensure_ascii=False, indent=2)
+        filename = self._report_filename(timestamp, 'json')
+        
+        # orjson 只支持 2 空格缩进，其他缩进交给标准库
+        if orjson is not None and self.json_indent in (None, 2):
+            option = orjson.OPT_NON_STR_KEYS
+            if self.json_indent:
+                option |= orjson.OPT_INDENT_2
+            with self._open_report(filename, open, 'wb') as f:
+                f.write(orjson.dumps(report_data, default=_json_default, option=option))
+        else:
+            # 不缩进时使用紧凑分隔符，与 orjson 输出一致
+            separators = (',', ':') if self.json_indent is None else None
+            with self._open_report(filename, open, 'w', encoding='utf-8', buffering=_WRITE_BUFFER_SIZE) as f:
+                json.dump(report_data, f, ensure_ascii=False, indent=self.json_indent,
+                          separators=separators, default=_json_default)
         
         logger.info(f"JSON 报告已生成: {filename}")
         return filename
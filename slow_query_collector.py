@@ -5,20 +5,120 @@
 从 StarRocks 收集慢查询数据
 """
 
-from typing import List, Dict, Any, Optional
+from bisect import bisect_right
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-import sqlparse
+from functools import lru_cache
+from operator import itemgetter
 from starrocks_connector import StarRocksConnector
+from sql_regex import compile_pattern
 import logging
+import re
+import sys
+
+import numpy as np
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 数据类在 Python 3.10+ 上使用 __slots__，减少每个实例的内存占用
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+# SQL 解析结果缓存的条数（日志中同一 SQL 模板往往反复出现）
+_SQL_CACHE_SIZE = 4096
+
+# FROM/JOIN/INTO/UPDATE 后的表名，支持 db.table 形式以及反引号、双引号、方括号引用的标识符
+_RE_TABLE = compile_pattern(
+    r'\b(?:FROM|JOIN|INTO|UPDATE)\s+'
+    r'((?:[`"\[]?[A-Za-z_]\w*[`"\]]?\.)*[`"\[]?[A-Za-z_]\w*[`"\]]?)',
+    re.IGNORECASE
+)
+_RE_QUOTE = compile_pattern(r'[`"\[\]]')
+
+# 严重程度的执行时间阈值（秒）及对应等级：< 1 为 LOW，[1, 5) 为 MEDIUM，[5, 10) 为 HIGH，>= 10 为 CRITICAL
+_SEVERITY_THRESHOLDS = (1.0, 5.0, 10.0)
+_SEVERITY_LEVELS = ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+
+# 过短的 query_text 不是有效的业务 SQL（下限按 UTF-8 字节数计，与 SQL 的 LENGTH 一致）；
+# 过长的只取前缀，限制单行传输量
+_MIN_QUERY_TEXT_LENGTH = 10
+_MAX_QUERY_TEXT_LENGTH = 65536
+
+# 查询慢 SQL 的语句，只拼接实际指定的过滤条件，便于 StarRocks 对 database/user 做谓词下推；
+# query_text 长度下限在客户端解析时检查，避免数据库对每行计算 LENGTH
+_COLLECT_SQL = """
+SELECT
+    query_id,
+    SUBSTRING(query_text, 1, %s) AS query_text,
+    database,
+    user,
+    query_time_seconds as execution_time,
+    scan_rows,
+    scan_bytes,
+    memory_used_bytes as memory_used,
+    cpu_time_ns / 1000000000 as cpu_time,
+    start_time,
+    end_time,
+    peak_memory_bytes as peak_memory,
+    rows_returned
+FROM information_schema.query_log
+WHERE start_time >= %s
+  AND query_time_seconds >= %s
+  AND query_text IS NOT NULL
+  AND query_text != ''"""
+_COLLECT_SQL_ORDER = " ORDER BY query_time_seconds DESC LIMIT 1000"
+
+# 紧跟在关键字后但不是表名的词
+_NOT_TABLE_NAMES = frozenset(('WHERE', 'ON', 'SELECT'))
+
+# 按 SlowQueryInfo 字段顺序一次取出查询结果行中的所有列
+_ROW_GETTER = itemgetter(
+    'query_id', 'query_text', 'database', 'user', 'execution_time', 'scan_rows',
+    'scan_bytes', 'memory_used', 'cpu_time', 'start_time', 'end_time',
+    'peak_memory', 'rows_returned'
+)
+
+
+# 字节数的换算单位，下标为 (bit_length - 1) // 10，即以 1024 为底的数量级
+_BYTE_SCALES = ((1, 'B'), (1024, 'KB'), (1048576, 'MB'), (1073741824, 'GB'))
+
+# 行数的换算阈值及对应的除数和单位
+_ROW_THRESHOLDS = (10000, 100000000)
+_ROW_SCALES = ((1, ''), (10000, ' 万'), (100000000, ' 亿'))
+
+
+def _long_enough(text: str) -> bool:
+    """query_text 的 UTF-8 字节数是否超过下限（字符数超过下限时字节数必然超过，无需编码）"""
+    return len(text) > _MIN_QUERY_TEXT_LENGTH or len(text.encode('utf-8')) > _MIN_QUERY_TEXT_LENGTH
+
+
+def _format_bytes(n: int) -> str:
+    """将字节数格式化为 B/KB/MB/GB（n 可以是 int、float、Decimal 或 NumPy 整数）"""
+    i = min(3, max(0, (int(n).bit_length() - 1) // 10))
+    if not i:
+        return f"{n} B"
+    scale, unit = _BYTE_SCALES[i]
+    return f"{n / scale:.2f} {unit}"
+
+
+def _format_rows(n: int) -> str:
+    """将行数格式化为万/亿"""
+    i = bisect_right(_ROW_THRESHOLDS, n)
+    if not i:
+        return str(n)
+    scale, unit = _ROW_SCALES[i]
+    return f"{n / scale:.2f}{unit}"
 
-@dataclass
+
+@dataclass(**_DATACLASS_SLOTS)
 class SlowQueryInfo:
-    """慢查询信息"""
+    """
+    慢查询信息
+
+    严重程度和格式化后的扫描量在首次访问时计算并缓存在槽位中，报告和统计会多次读取它们；
+    创建后不应再修改 execution_time、scan_rows、scan_bytes。
+    """
     query_id: str
     query_text: str
     database: str
@@ -32,6 +132,43 @@ class SlowQueryInfo:
     end_time: datetime
     peak_memory: int = 0
     rows_returned: int = 0
+    # 派生值的缓存，不参与构造、比较和 repr
+    _severity: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    _scan_rows_formatted: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    _scan_bytes_formatted: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> 'SlowQueryInfo':
+        """
+        从查询结果行构造慢查询信息
+        
+        Args:
+            row: 包含 collect 查询所有列的结果行，NULL 值按空值处理
+            
+        Returns:
+            慢查询信息
+        """
+        (qid, text, db, usr, et, sr, sb, mem, cpu,
+         st, ed, peak, returned) = _ROW_GETTER(row)
+        return cls(
+            qid, text, db or '', usr or '', float(et or 0), int(sr or 0), int(sb or 0),
+            int(mem or 0), float(cpu or 0), st or datetime.now(), ed or datetime.now(),
+            int(peak or 0), int(returned or 0)
+        )
+    
+    @classmethod
+    def from_rows(cls, rows: List[Dict[str, Any]]) -> List['SlowQueryInfo']:
+        """
+        批量构造慢查询信息，任一行无法解析时抛出异常
+        
+        Args:
+            rows: 查询结果行列表
+            
+        Returns:
+            慢查询信息列表
+        """
+        from_row = cls.from_row
+        return [from_row(row) for row in rows]
     
     @property
     def execution_time_ms(self) -> float:
@@ -41,33 +178,26 @@ class SlowQueryInfo:
     @property
     def scan_rows_formatted(self) -> str:
         """格式化扫描行数"""
-        if self.scan_rows >= 100000000:
-            return f"{self.scan_rows / 100000000:.2f} 亿"
-        elif self.scan_rows >= 10000:
-            return f"{self.scan_rows / 10000:.2f} 万"
-        return str(self.scan_rows)
+        formatted = self._scan_rows_formatted
+        if formatted is None:
+            formatted = self._scan_rows_formatted = _format_rows(self.scan_rows)
+        return formatted
     
     @property
     def scan_bytes_formatted(self) -> str:
         """格式化扫描字节数"""
-        if self.scan_bytes >= 1073741824:
-            return f"{self.scan_bytes / 1073741824:.2f} GB"
-        elif self.scan_bytes >= 1048576:
-            return f"{self.scan_bytes / 1048576:.2f} MB"
-        elif self.scan_bytes >= 1024:
-            return f"{self.scan_bytes / 1024:.2f} KB"
-        return f"{self.scan_bytes} B"
+        formatted = self._scan_bytes_formatted
+        if formatted is None:
+            formatted = self._scan_bytes_formatted = _format_bytes(self.scan_bytes)
+        return formatted
     
     @property
     def severity(self) -> str:
         """严重程度"""
-        if self.execution_time >= 10.0:
-            return "CRITICAL"
-        elif self.execution_time >= 5.0:
-            return "HIGH"
-        elif self.execution_time >= 1.0:
-            return "MEDIUM"
-        return "LOW"
+        severity = self._severity
+        if severity is None:
+            severity = self._severity = _SEVERITY_LEVELS[bisect_right(_SEVERITY_THRESHOLDS, self.execution_time)]
+        return severity
 
 
 class SlowQueryCollector:
@@ -87,7 +217,9 @@ class SlowQueryCollector:
         time_range_hours: int = 24,
         min_execution_time: float = 1.0,
         database_filter: Optional[str] = None,
-        user_filter: Optional[str] = None
+        user_filter: Optional[str] = None,
+        pattern_filter: Optional[str] = None,
+        severity_min: Optional[str] = None
     ) -> List[SlowQueryInfo]:
         """
         收集慢查询
@@ -97,36 +229,100 @@ class SlowQueryCollector:
             min_execution_time: 最小执行时间（秒）
             database_filter: 数据库名称过滤
             user_filter: 用户名过滤
+            pattern_filter: SQL 模式过滤（不区分大小写的子串匹配，在数据库端执行）
+            severity_min: 最低严重程度（LOW/MEDIUM/HIGH/CRITICAL），换算为执行时间下限
             
         Returns:
-            慢查询列表
+            慢查询列表，数据库出错时为空列表
+            
+        Raises:
+            Exception: 数据库驱动以外的错误（如解析结果时的程序错误）原样抛出
+        """
+        query, params = self._build_collect_query(
+            time_range_hours, min_execution_time, database_filter, user_filter,
+            pattern_filter, severity_min
+        )
+        
+        # 服务端游标分批读取，边读边构造，不保留完整的原始结果集
+        slow_queries = []
+        try:
+            for rows in self.connector.iter_query_batches(query, params):
+                slow_queries.extend(self._parse_rows(rows))
+        except self.connector.driver_error as e:
+            # 错误详情已由连接器记录；与一次性读取时执行失败返回空列表保持一致，不返回不完整的结果
+            logger.warning(f"读取慢查询中途出错，丢弃已读取的 {len(slow_queries)} 条不完整结果: {str(e)}")
+            return []
+        
+        logger.info(f"收集到 {len(slow_queries)} 条慢查询")
+        return slow_queries
+    
+    def iter_slow_queries(
+        self,
+        time_range_hours: int = 24,
+        min_execution_time: float = 1.0,
+        database_filter: Optional[str] = None,
+        user_filter: Optional[str] = None,
+        pattern_filter: Optional[str] = None,
+        severity_min: Optional[str] = None,
+        batch_size: int = 128
+    ) -> Iterator[List[SlowQueryInfo]]:
         """
-        start_time = datetime.now() - timedelta(hours=time_range_hours)
+        分批收集慢查询
         
-        # 查询慢 SQL 的 SQL
-        query = """
-        SELECT
-            query_id,
-            query_text,
-            database,
-            user,
-            query_time_seconds as execution_time,
-            scan_rows,
-            scan_bytes,
-            memory_used_bytes as memory_used,
-            cpu_time_ns / 1000000000 as cpu_time,
-            start_time,
-            end_time,
-            peak_memory_bytes as peak_memory,
-            rows_returned
-        FROM information_schema.query_log
-        WHERE start_time >= %s
-          AND query_time_seconds >= %s
-          AND query_text IS NOT NULL
-          AND LENGTH(query_text) > 10
+        结果通过服务端游标流式读取，每读到一批就交给调用方处理，
+        调用方可以在后续批次仍在传输时开始分析。
+        
+        Args:
+            time_range_hours: 时间范围（小时）
+            min_execution_time: 最小执行时间（秒）
+            database_filter: 数据库名称过滤
+            user_filter: 用户名过滤
+            pattern_filter: SQL 模式过滤（不区分大小写的子串匹配，在数据库端执行）
+            severity_min: 最低严重程度（LOW/MEDIUM/HIGH/CRITICAL），换算为执行时间下限
+            batch_size: 每批的查询条数
+            
+        Yields:
+            慢查询列表（一批）
+            
+        Raises:
+            Exception: 读取过程中出错时抛出，已产出的批次不构成完整结果
         """
+        query, params = self._build_collect_query(
+            time_range_hours, min_execution_time, database_filter, user_filter,
+            pattern_filter, severity_min
+        )
+        
+        total = 0
+        for rows in self.connector.iter_query_batches(query, params, batch_size):
+            slow_queries = self._parse_rows(rows)
+            total += len(slow_queries)
+            if slow_queries:
+                yield slow_queries
+        
+        logger.info(f"收集到 {total} 条慢查询")
+    
+    def _build_collect_query(
+        self,
+        time_range_hours: int,
+        min_execution_time: float,
+        database_filter: Optional[str],
+        user_filter: Optional[str],
+        pattern_filter: Optional[str] = None,
+        severity_min: Optional[str] = None
+    ) -> Tuple[str, tuple]:
+        """构造查询慢 SQL 的语句和参数，过滤条件尽量下推到数据库，减少传输的行数"""
+        # 预先格式化为字符串参数，驱动无需逐次走 datetime 的转换逻辑
+        start_time = (datetime.now() - timedelta(hours=time_range_hours)).strftime('%Y-%m-%d %H:%M:%S')
         
-        params = [start_time, min_execution_time]
+        if severity_min:
+            if severity_min.upper() not in _SEVERITY_LEVELS:
+                raise ValueError(f"不支持的严重程度: {severity_min}")
+            level = _SEVERITY_LEVELS.index(severity_min.upper())
+            if level > 0:
+                min_execution_time = max(min_execution_time, _SEVERITY_THRESHOLDS[level - 1])
+        
+        query = _COLLECT_SQL
+        params = [_MAX_QUERY_TEXT_LENGTH, start_time, min_execution_time]
         
         if database_filter:
             query += " AND database = %s"
@@ -136,34 +332,33 @@ class SlowQueryCollector:
             query += " AND user = %s"
             params.append(user_filter)
         
-        query += " ORDER BY query_time_seconds DESC LIMIT 1000"
+        if pattern_filter:
+            # 与 filter_by_pattern 一致：不区分大小写的字面子串匹配，需转义 LIKE 通配符
+            escaped = pattern_filter.upper().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            query += " AND UPPER(query_text) LIKE %s"
+            params.append(f"%{escaped}%")
+        
+        query += _COLLECT_SQL_ORDER
         
-        results = self.connector.execute_query(query, tuple(params))
+        return query, tuple(params)
+    
+    def _parse_rows(self, rows: List[Dict[str, Any]]) -> List[SlowQueryInfo]:
+        """将查询结果行转换为慢查询信息"""
+        rows = [row for row in rows if _long_enough(row.get('query_text') or '')]
+        try:
+            return SlowQueryInfo.from_rows(rows)
+        except Exception:
+            # 批量构造失败时逐行重试，跳过无法解析的行
+            pass
         
         slow_queries = []
-        for row in results:
+        for row in rows:
             try:
-                query_info = SlowQueryInfo(
-                    query_id=row['query_id'],
-                    query_text=row['query_text'],
-                    database=row.get('database', ''),
-                    user=row.get('user', ''),
-                    execution_time=float(row.get('execution_time', 0)),
-                    scan_rows=int(row.get('scan_rows', 0)),
-                    scan_bytes=int(row.get('scan_bytes', 0)),
-                    memory_used=int(row.get('memory_used', 0)),
-                    cpu_time=float(row.get('cpu_time', 0)),
-                    start_time=row.get('start_time', datetime.now()),
-                    end_time=row.get('end_time', datetime.now()),
-                    peak_memory=int(row.get('peak_memory', 0)),
-                    rows_returned=int(row.get('rows_returned', 0))
-                )
-                slow_queries.append(query_info)
+                slow_queries.append(SlowQueryInfo.from_row(row))
             except Exception as e:
                 logger.warning(f"解析慢查询失败: {str(e)}")
                 continue
         
-        logger.info(f"收集到 {len(slow_queries)} 条慢查询")
         return slow_queries
     
     def get_query_statistics(self, slow_queries: List[SlowQueryInfo]) -> Dict[str, Any]:
@@ -186,19 +381,27 @@ class SlowQueryCollector:
                 "severity_distribution": {}
             }
         
-        total_time = sum(q.execution_time for q in slow_queries)
-        max_time = max(q.execution_time for q in slow_queries)
-        total_scan_rows = sum(q.scan_rows for q in slow_queries)
-        total_scan_bytes = sum(q.scan_bytes for q in slow_queries)
+        n = len(slow_queries)
+        exec_times = np.fromiter((q.execution_time for q in slow_queries), dtype=np.float64, count=n)
+        scan_rows = np.fromiter((q.scan_rows for q in slow_queries), dtype=np.int64, count=n)
+        scan_bytes = np.fromiter((q.scan_bytes for q in slow_queries), dtype=np.int64, count=n)
         
-        severity_distribution = {}
-        for q in slow_queries:
-            severity = q.severity
-            severity_distribution[severity] = severity_distribution.get(severity, 0) + 1
+        total_time = float(exec_times.sum())
+        max_time = float(exec_times.max())
+        total_scan_rows = int(scan_rows.sum())
+        total_scan_bytes = int(scan_bytes.sum())
+        
+        # 严重程度只取决于执行时间，按阈值直接算出等级下标；分布按首次出现的顺序排列
+        codes = np.searchsorted(_SEVERITY_THRESHOLDS, exec_times, side='right')
+        levels, first_index, counts = np.unique(codes, return_index=True, return_counts=True)
+        severity_distribution = {
+            _SEVERITY_LEVELS[levels[i]]: int(counts[i])
+            for i in np.argsort(first_index)
+        }
         
         return {
-            "total_queries": len(slow_queries),
-            "avg_execution_time": total_time / len(slow_queries),
+            "total_queries": n,
+            "avg_execution_time": total_time / n,
             "max_execution_time": max_time,
             "total_scan_rows": total_scan_rows,
             "total_scan_bytes": total_scan_bytes,
@@ -216,11 +419,9 @@ class SlowQueryCollector:
         Returns:
             过滤后的查询列表
         """
-        pattern = pattern.upper()
-        filtered = [
-            q for q in queries 
-            if pattern in q.query_text.upper()
-        ]
+        # 字面子串的不区分大小写匹配，在 C 层完成，不为每条 SQL 生成大写副本
+        search = re.compile(re.escape(pattern), re.IGNORECASE).search
+        filtered = [q for q in queries if search(q.query_text)]
         logger.info(f"模式 '{pattern}' 过滤后剩余 {len(filtered)} 条查询")
         return filtered
     
@@ -234,32 +435,23 @@ class SlowQueryCollector:
         Returns:
             按表分组的查询字典
         """
-        table_groups = {}
+        table_groups = defaultdict(list)
         
         for query in queries:
             try:
-                # 简单的表名提取（基于 FROM/JOIN 子句）
-                parsed = sqlparse.parse(query.query_text)[0]
-                tables = []
-                
-                for token in parsed.flatten():
-                    if token.ttype is None and token.value.upper() in ('FROM', 'JOIN', 'INTO', 'UPDATE'):
-                        # 获取表名
-                        next_tokens = list(token.flatten())
-                        for i, t in enumerate(next_tokens):
-                            if t.value.upper() in ('FROM', 'JOIN', 'INTO', 'UPDATE'):
-                                if i + 2 < len(next_tokens):
-                                    table = next_tokens[i + 2].value.strip('`"[]')
-                                    if table and table.upper() not in ('WHERE', 'ON', 'SELECT'):
-                                        tables.append(table)
+                tables = _extract_tables_cached(query.query_text)
                 
                 for table in tables:
-                    if table not in table_groups:
-                        table_groups[table] = []
                     table_groups[table].append(query)
             except Exception as e:
                 logger.debug(f"提取表名失败: {str(e)}")
                 continue
         
-        return table_groups
+        return dict(table_groups)
+
 
+@lru_cache(maxsize=_SQL_CACHE_SIZE)
+def _extract_tables_cached(query_text: str) -> Tuple[str, ...]:
+    """提取 SQL 中 FROM/JOIN/INTO/UPDATE 后的表名（去掉引号，保持出现顺序并去重），同一 SQL 只提取一次"""
+    tables = (_RE_QUOTE.sub('', match.group(1)) for match in _RE_TABLE.finditer(query_text))
+    return tuple(dict.fromkeys(t for t in tables if t.upper() not in _NOT_TABLE_NAMES))
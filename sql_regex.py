@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQL 正则编译工具
+优先使用 RE2（线性时间匹配，无回溯风险），不可用时回退到标准库 re
+"""
+
+import re
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+
+def compile_pattern(pattern: str, flags: int = 0):
+    """
+    编译正则表达式
+
+    安装了 google-re2 时使用 RE2 编译，避免异常 SQL 触发灾难性回溯；
+    RE2 不支持的语法（如前瞻断言）或未安装 RE2 时回退到 re。
+    RE2 中 \\b、\\w、\\s、\\d 只匹配 ASCII 字符，回退时同样使用 re.ASCII，
+    匹配结果不因是否安装 RE2 而不同。
+
+    Args:
+        pattern: 正则表达式
+        flags: re 标志，目前仅识别 re.IGNORECASE（re.ASCII 总是生效）
+
+    Returns:
+        编译后的正则对象（re2 与 re 的接口兼容）
+    """
+    if re2 is not None and not flags & ~(re.IGNORECASE | re.ASCII):
+        options = re2.Options()
+        options.log_errors = False
+        options.case_sensitive = not flags & re.IGNORECASE
+        try:
+            return re2.compile(pattern, options)
+        except re2.error:
+            pass
+    return re.compile(pattern, flags | re.ASCII)
@@ -5,16 +5,51 @@ StarRocks 数据库连接器
 提供 StarRocks 数据库连接和查询功能
 """
 
+import importlib
 import pymysql
-from typing import Dict, List, Any, Optional
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Iterator, Union
 from dataclasses import dataclass
 import logging
+import sys
+
+try:
+    from dbutils.pooled_db import PooledDB
+except ImportError:
+    PooledDB = None
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 数据类在 Python 3.10+ 上使用 __slots__，减少每个实例的内存占用
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+# 连接池启动时建立的空闲连接数，以及最多保留的空闲连接数
+_POOL_MIN_CACHED = 1
+_POOL_MAX_CACHED = 4
+
+
+def _load_driver(name: str):
+    """
+    加载 DB-API 驱动模块
+    
+    驱动需提供 connect() 以及 cursors.DictCursor / cursors.SSDictCursor，
+    pymysql 和 mysqlclient（MySQLdb）均满足；加载失败时回退到 pymysql。
+    
+    Args:
+        name: 驱动模块名，如 pymysql、MySQLdb
+        
+    Returns:
+        (驱动模块, 游标模块)
+    """
+    if name != 'pymysql':
+        try:
+            return importlib.import_module(name), importlib.import_module(f"{name}.cursors")
+        except ImportError as e:
+            logger.warning(f"数据库驱动 {name} 不可用，回退到 pymysql: {str(e)}")
+    return pymysql, pymysql.cursors
+
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class ConnectionConfig:
     """数据库连接配置"""
     host: str = "127.0.0.1"
@@ -22,6 +57,7 @@ class ConnectionConfig:
     user: str = "root"
     password: str = ""
     database: str = "information_schema"
+    driver: str = "pymysql"  # 数据库驱动模块，可选 MySQLdb（mysqlclient，C 实现，大结果集解析更快）
 
 
 class StarRocksConnector:
@@ -36,24 +72,44 @@ class StarRocksConnector:
         """
         self.config = config
         self.connection = None
+        self._pool = None
+        self._driver, self._cursors = _load_driver(config.driver)
+    
+    @property
+    def driver_error(self) -> type:
+        """当前驱动的 DB-API 异常基类（pymysql.Error 或 MySQLdb.Error）"""
+        return self._driver.Error
     
     def connect(self) -> bool:
         """
         建立数据库连接
         
+        安装了 DBUtils 时创建连接池，每次查询从池中借用连接，多次分析之间复用已建立的连接；
+        否则建立单个连接。
+        
         Returns:
             连接是否成功
         """
+        connect_args = dict(
+            host=self.config.host,
+            port=self.config.port,
+            user=self.config.user,
+            password=self.config.password,
+            database=self.config.database,
+            charset='utf8mb4',
+            cursorclass=self._cursors.DictCursor
+        )
         try:
-            self.connection = pymysql.connect(
-                host=self.config.host,
-                port=self.config.port,
-                user=self.config.user,
-                password=self.config.password,
-                database=self.config.database,
-                charset='utf8mb4',
-                cursorclass=pymysql.cursors.DictCursor
-            )
+            if PooledDB is not None:
+                if self._pool is None:
+                    self._pool = PooledDB(
+                        creator=self._driver,
+                        mincached=_POOL_MIN_CACHED,
+                        maxcached=_POOL_MAX_CACHED,
+                        **connect_args
+                    )
+            else:
+                self.connection = self._driver.connect(**connect_args)
             logger.info(f"成功连接到 StarRocks: {self.config.host}:{self.config.port}")
             return True
         except Exception as e:
@@ -61,28 +117,71 @@ class StarRocksConnector:
             return False
     
     def disconnect(self):
-        """断开数据库连接"""
+        """
+        断开数据库连接
+        
+        使用连接池时连接在每次查询后已归还，池中的空闲连接保留给后续分析复用，
+        需要释放时调用 close()。
+        """
         if self.connection:
             self.connection.close()
+            self.connection = None
             logger.info("已断开 StarRocks 连接")
     
-    def execute_query(self, sql: str, params: Optional[tuple] = None) -> List[Dict[str, Any]]:
+    def close(self):
+        """断开数据库连接并关闭连接池"""
+        self.disconnect()
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+            logger.info("已关闭 StarRocks 连接池")
+    
+    def _ensure_connected(self) -> bool:
+        """尚未连接时建立连接"""
+        if self._pool is not None or self.connection:
+            return True
+        return self.connect()
+    
+    @contextmanager
+    def _acquire(self):
+        """借用一个连接，使用连接池时用完归还"""
+        if self._pool is None:
+            yield self.connection
+            return
+        
+        conn = self._pool.connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
+    
+    def execute_query(
+        self,
+        sql: str,
+        params: Optional[tuple] = None,
+        batch_size: int = 500,
+        stream: bool = False
+    ) -> Union[List[Dict[str, Any]], Iterator[Dict[str, Any]]]:
         """
         执行查询并返回结果
         
         Args:
             sql: SQL 查询语句
             params: 查询参数
+            batch_size: 流式读取时每次 fetchmany 的行数
+            stream: 是否使用服务端游标流式读取，为 True 时返回逐行的迭代器
             
         Returns:
-            查询结果列表
+            查询结果列表，出错时为空列表（stream 为 True 时为结果行迭代器，出错时在迭代中抛出异常）
         """
-        if not self.connection:
-            if not self.connect():
-                return []
+        if stream:
+            return (row for rows in self.iter_query_batches(sql, params, batch_size) for row in rows)
+        
+        if not self._ensure_connected():
+            return []
         
         try:
-            with self.connection.cursor() as cursor:
+            with self._acquire() as conn, conn.cursor() as cursor:
                 cursor.execute(sql, params or ())
                 result = cursor.fetchall()
                 return result
@@ -91,6 +190,46 @@ class StarRocksConnector:
             logger.error(f"SQL: {sql}")
             return []
     
+    def iter_query_batches(
+        self,
+        sql: str,
+        params: Optional[tuple] = None,
+        batch_size: int = 500
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        执行查询并分批返回结果
+        
+        使用服务端游标（SSDictCursor）流式读取，不在内存中缓存整个结果集。
+        迭代结束前不能在同一连接上执行其他查询。
+        
+        Args:
+            sql: SQL 查询语句
+            params: 查询参数
+            batch_size: 每批的行数
+            
+        Yields:
+            查询结果列表（一批）
+            
+        Raises:
+            Exception: 执行或读取过程中出错（如连接中断）时记录日志后重新抛出，
+                避免调用方把已读取的部分结果当作完整结果
+        """
+        if not self._ensure_connected():
+            return
+        
+        try:
+            with self._acquire() as conn, conn.cursor(self._cursors.SSDictCursor) as cursor:
+                cursor.execute(sql, params or ())
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+        except Exception as e:
+            logger.error(f"执行查询失败: {str(e)}")
+            logger.error(f"SQL: {sql}")
+            raise
+    
     def execute_query_one(self, sql: str, params: Optional[tuple] = None) -> Optional[Dict[str, Any]]:
         """
         执行查询并返回单条结果
@@ -112,7 +251,7 @@ class StarRocksConnector:
     
     def __exit__(self, exc_type, exc_val, exc_tb):
         """上下文管理器退出"""
-        self.disconnect()
+        self.close()
     
     def test_connection(self) -> bool:
         """
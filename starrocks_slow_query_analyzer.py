@@ -7,9 +7,15 @@ StarRocks 慢 SQL 分析主程序
 
 import yaml
 import argparse
+import copy
 import logging
-from typing import Dict, Any, Optional
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Tuple, Union
 from datetime import datetime
+from functools import lru_cache
 
 from starrocks_connector import StarRocksConnector, ConnectionConfig
 from slow_query_collector import SlowQueryCollector
@@ -17,12 +23,30 @@ from query_analyzer import QueryAnalyzer
 from optimization_suggester import OptimizationSuggester
 from report_generator import ReportGenerator
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# 每次从服务端游标读取的慢查询条数
+_FETCH_BATCH_SIZE = 128
+
+# 读取线程最多预取的批数，超过后等待分析追上
+_PREFETCH_BATCHES = 8
+
+
+@lru_cache(maxsize=8)
+def _read_config(config_path: str, mtime: float) -> Dict[str, Any]:
+    """
+    解析配置文件，按路径和修改时间缓存，文件修改后自动重新解析
+    
+    Args:
+        config_path: 配置文件路径
+        mtime: 配置文件修改时间，仅作为缓存键
+        
+    Returns:
+        配置字典（缓存共享，调用方需复制后再使用）
+    """
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
 
 class StarRocksSlowQueryAnalyzer:
     """StarRocks 慢 SQL 分析器主类"""
@@ -44,6 +68,9 @@ class StarRocksSlowQueryAnalyzer:
         self.analyzer = QueryAnalyzer(self.config.get('optimization', {}))
         self.suggester = OptimizationSuggester(self.config.get('optimization', {}))
         self.report_generator = ReportGenerator(self.config.get('output', {}))
+        
+        # 生成优化建议的线程数，默认 1 表示顺序生成（纯 Python 计算，多线程受 GIL 限制），0 表示 CPU 核数的两倍
+        self.parallelism = self.config.get('parallelism', 1)
     
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """
@@ -56,10 +83,9 @@ class StarRocksSlowQueryAnalyzer:
             配置字典
         """
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
-                logger.info(f"配置文件加载成功: {config_path}")
-                return config
+            config = copy.deepcopy(_read_config(config_path, os.path.getmtime(config_path)))
+            logger.info(f"配置文件加载成功: {config_path}")
+            return config
         except FileNotFoundError:
             logger.warning(f"配置文件不存在: {config_path}，使用默认配置")
             return self._default_config()
@@ -97,8 +123,9 @@ class StarRocksSlowQueryAnalyzer:
         min_execution_time: Optional[float] = None,
         database_filter: Optional[str] = None,
         user_filter: Optional[str] = None,
-        pattern_filter: Optional[str] = None
-    ) -> str:
+        pattern_filter: Optional[str] = None,
+        severity_min: Optional[str] = None
+    ) -> Union[str, List[str]]:
         """
         执行慢 SQL 分析
         
@@ -108,9 +135,10 @@ class StarRocksSlowQueryAnalyzer:
             database_filter: 数据库名称过滤
             user_filter: 用户名过滤
             pattern_filter: SQL 模式过滤
+            severity_min: 最低严重程度（LOW/MEDIUM/HIGH/CRITICAL）
             
         Returns:
-            报告文件路径
+            报告文件路径（配置了多种报告格式时为路径列表）
         """
         # 使用配置或参数
         time_range = time_range_hours or self.config.get('analysis_time_range', 24)
@@ -123,18 +151,16 @@ class StarRocksSlowQueryAnalyzer:
             raise Exception("无法连接到 StarRocks 数据库")
         
         try:
-            # 收集慢查询
-            slow_queries = self.collector.collect_slow_queries(
+            # 收集并分析慢查询（读取与分析流水线并行）
+            slow_queries, problems_by_query, suggestions_by_query = self._collect_and_analyze(
                 time_range_hours=time_range,
                 min_execution_time=threshold,
                 database_filter=database_filter,
-                user_filter=user_filter
+                user_filter=user_filter,
+                pattern_filter=pattern_filter,
+                severity_min=severity_min
             )
             
-            # 模式过滤
-            if pattern_filter:
-                slow_queries = self.collector.filter_by_pattern(slow_queries, pattern_filter)
-            
             if not slow_queries:
                 logger.info("没有发现慢查询")
                 return "无慢查询"
@@ -143,31 +169,14 @@ class StarRocksSlowQueryAnalyzer:
             statistics = self.collector.get_query_statistics(slow_queries)
             logger.info(f"收集到 {statistics['total_queries']} 条慢查询")
             
-            # 分析每个查询
-            problems_by_query = {}
-            suggestions_by_query = {}
-            
-            for query in slow_queries:
-                try:
-                    # 分析问题
-                    problems = self.analyzer.analyze_query(query)
-                    problems_by_query[query.query_id] = problems
-                    
-                    # 生成建议
-                    suggestions = self.suggester.generate_suggestions(query, problems)
-                    suggestions_by_query[query.query_id] = suggestions
-                    
-                except Exception as e:
-                    logger.warning(f"分析查询失败: {query.query_id}, 错误: {str(e)}")
-                    continue
-            
             # 生成报告
             metadata = {
                 'time_range': time_range,
                 'threshold': threshold,
                 'database': database_filter,
                 'user': user_filter,
-                'pattern': pattern_filter
+                'pattern': pattern_filter,
+                'severity_min': severity_min
             }
             
             report_path = self.report_generator.generate_report(
@@ -184,6 +193,149 @@ class StarRocksSlowQueryAnalyzer:
         finally:
             self.connector.disconnect()
     
+    def _collect_and_analyze(
+        self,
+        time_range_hours: int,
+        min_execution_time: float,
+        database_filter: Optional[str],
+        user_filter: Optional[str],
+        pattern_filter: Optional[str],
+        severity_min: Optional[str]
+    ) -> Tuple[List, Dict[str, List], Dict[str, List]]:
+        """
+        收集并分析慢查询
+        
+        后台线程通过服务端游标分批读取慢查询放入有界队列，当前线程将读取的批次累积到
+        parallel_min_batch 条后分析，网络传输与分析计算重叠进行，整个过程复用同一个进程池。
+        
+        Args:
+            time_range_hours: 时间范围（小时）
+            min_execution_time: 最小执行时间（秒）
+            database_filter: 数据库名称过滤
+            user_filter: 用户名过滤
+            pattern_filter: SQL 模式过滤
+            severity_min: 最低严重程度
+            
+        Returns:
+            (慢查询列表, 按查询ID分组的问题, 按查询ID分组的建议)
+        """
+        batches = queue.Queue(maxsize=_PREFETCH_BATCHES)
+        stop = threading.Event()
+        
+        def produce():
+            try:
+                for batch in self.collector.iter_slow_queries(
+                    time_range_hours=time_range_hours,
+                    min_execution_time=min_execution_time,
+                    database_filter=database_filter,
+                    user_filter=user_filter,
+                    pattern_filter=pattern_filter,
+                    severity_min=severity_min,
+                    batch_size=_FETCH_BATCH_SIZE
+                ):
+                    if stop.is_set():
+                        break
+                    batches.put(batch)
+            except Exception as e:
+                batches.put(e)
+            finally:
+                batches.put(None)
+        
+        producer = threading.Thread(target=produce, name='slow-query-fetcher', daemon=True)
+        producer.start()
+        
+        slow_queries = []
+        problems_by_query = {}
+        suggestions_by_query = {}
+        
+        # 读取的批次累积到 parallel_min_batch 条后再一起分析，使结构分析的去重和进程池作用于足够大的数据
+        chunk_size = max(_FETCH_BATCH_SIZE, self.analyzer.parallel_min_batch)
+        pending = []
+        
+        threads = self.parallelism or (os.cpu_count() or 1) * 2
+        executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='suggester') if threads > 1 else None
+        suggest_map = executor.map if executor else map
+        
+        def analyze_pending():
+            problems_list = self._analyze_problems(pending)
+            
+            # 生成建议（各查询互不依赖，配置了 parallelism 时分发到线程池）
+            analyzed = [(q, p) for q, p in zip(pending, problems_list) if p is not None]
+            suggestions_list = suggest_map(
+                self._generate_suggestions, [q for q, _ in analyzed], [p for _, p in analyzed]
+            )
+            
+            for (query, problems), suggestions in zip(analyzed, suggestions_list):
+                problems_by_query[query.query_id] = problems
+                if suggestions is not None:
+                    suggestions_by_query[query.query_id] = suggestions
+            pending.clear()
+        
+        try:
+            with self.analyzer.reuse_process_pool():
+                while True:
+                    batch = batches.get()
+                    if batch is None:
+                        break
+                    if isinstance(batch, Exception):
+                        raise batch
+                    
+                    # 模式和严重程度过滤已下推到 SQL 中
+                    slow_queries.extend(batch)
+                    pending.extend(batch)
+                    if len(pending) >= chunk_size:
+                        analyze_pending()
+                
+                if pending:
+                    analyze_pending()
+        finally:
+            if executor:
+                executor.shutdown()
+            
+            # 提前退出时通知读取线程停止，并清空队列避免其阻塞在 put 上
+            stop.set()
+            while producer.is_alive():
+                try:
+                    batches.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        
+        return slow_queries, problems_by_query, suggestions_by_query
+    
+    def _analyze_problems(self, queries: List) -> List[Optional[List]]:
+        """
+        批量分析查询问题
+        
+        批量分析失败时逐条重试，单条查询分析失败只跳过该查询，不影响整份报告。
+        
+        Args:
+            queries: 慢查询列表
+            
+        Returns:
+            与 queries 一一对应的问题列表，分析失败的查询为 None
+        """
+        try:
+            return self.analyzer.analyze_queries_batch(queries)
+        except Exception as e:
+            logger.warning(f"批量分析失败，改为逐条分析: {str(e)}")
+        
+        problems_list = []
+        for query in queries:
+            try:
+                problems_list.append(self.analyzer.analyze_query(query))
+            except Exception as e:
+                logger.warning(f"分析查询失败: {query.query_id}, 错误: {str(e)}")
+                problems_list.append(None)
+        return problems_list
+    
+    def _generate_suggestions(self, query, problems) -> Optional[List]:
+        """为单条查询生成建议，失败时返回 None"""
+        try:
+            return self.suggester.generate_suggestions(query, problems)
+        except Exception as e:
+            logger.warning(f"分析查询失败: {query.query_id}, 错误: {str(e)}")
+            return None
+    
     def get_top_slow_queries(
         self,
         limit: int = 10,
@@ -246,8 +398,8 @@ class StarRocksSlowQueryAnalyzer:
             end_time=datetime.now() + timedelta(seconds=1)
         )
         
-        # 分析问题
-        problems = self.analyzer.analyze_query(query_info)
+        # 分析问题（手动提交的 SQL 没有执行统计，总是做结构分析）
+        problems = self.analyzer.analyze_query(query_info, deep_analysis=True)
         
         # 生成建议
         suggestions = self.suggester.generate_suggestions(query_info, problems)
@@ -279,6 +431,11 @@ class StarRocksSlowQueryAnalyzer:
 
 def main():
     """命令行主入口"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
     parser = argparse.ArgumentParser(description='StarRocks 慢 SQL 分析工具')
     parser.add_argument('--config', '-c', default='config.yaml', help='配置文件路径')
     parser.add_argument('--time-range', '-t', type=int, help='分析时间范围（小时）')
@@ -286,7 +443,10 @@ def main():
     parser.add_argument('--database', '-d', help='数据库名称过滤')
     parser.add_argument('--user', '-u', help='用户名过滤')
     parser.add_argument('--pattern', '-p', help='SQL 模式过滤')
-    parser.add_argument('--format', '-f', choices=['html', 'markdown', 'json'], help='报告格式')
+    parser.add_argument('--min-severity', choices=['LOW', 'MEDIUM', 'HIGH', 'CRITICAL'],
+                        help='最低严重程度')
+    parser.add_argument('--format', '-f', nargs='+', choices=['html', 'markdown', 'json'],
+                        help='报告格式，可指定多个（并行生成）')
     
     args = parser.parse_args()
     
@@ -295,7 +455,7 @@ def main():
     
     # 覆盖配置
     if args.format:
-        analyzer.report_generator.report_format = args.format
+        analyzer.report_generator.report_format = args.format[0] if len(args.format) == 1 else args.format
     
     # 执行分析
     try:
@@ -304,11 +464,13 @@ def main():
             min_execution_time=args.threshold,
             database_filter=args.database,
             user_filter=args.user,
-            pattern_filter=args.pattern
+            pattern_filter=args.pattern,
+            severity_min=args.min_severity
         )
         
         print(f"\n✅ 分析完成！")
-        print(f"📄 报告路径: {report_path}")
+        for path in ([report_path] if isinstance(report_path, str) else report_path):
+            print(f"📄 报告路径: {path}")
         
     except Exception as e:
         logger.error(f"分析失败: {str(e)}")
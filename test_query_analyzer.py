@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+query_analyzer 测试
+"""
+
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import query_analyzer
+from query_analyzer import ProblemType, QueryAnalyzer, _analyze_sql_text, _sql_fingerprint
+
+
+def _problem_types(sql):
+    return [problem.problem_type for problem in _analyze_sql_text(sql)]
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM t WHERE id = 1",
+    "select *  from t where id = 1",
+    "SELECT a FROM (SELECT * FROM u) x WHERE a = 1",
+])
+def test_select_star_detected(sql):
+    assert ProblemType.SELECT_STAR in _problem_types(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT id FROM t WHERE id = 1",
+    # 与 'SELECT *' 子串判断保持一致，SELECT 和 * 之间只允许一个空格
+    "SELECT  * FROM t WHERE id = 1",
+    "SELECT\n*\nFROM t WHERE id = 1",
+    "SELECT\t* FROM t WHERE id = 1",
+    "SELECT COUNT(*) FROM t WHERE id = 1",
+    "SELECT a * b FROM t WHERE id = 1",
+])
+def test_select_star_not_detected(sql):
+    assert ProblemType.SELECT_STAR not in _problem_types(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT id FROM t WHERE UPPER(name) = 'A'",
+    "SELECT id FROM t WHERE id = 1 AND DATE(created_at) = '2024-01-01'",
+    # 多语句时后面语句 WHERE 中的函数也会被发现
+    "SELECT a FROM t WHERE a = 1; SELECT b FROM u WHERE UPPER(b) = 'X'",
+])
+def test_function_in_where_detected(sql):
+    assert ProblemType.FUNCTION_IN_WHERE in _problem_types(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT UPPER(name) FROM t WHERE id = 1",
+    "SELECT id FROM t WHERE f() = 1",
+    "SELECT id FROM t WHERE id = 1; SELECT UPPER(b) FROM u",
+    # WHERE 子句到分号为止，函数参数不跨过分号
+    "SELECT id FROM t WHERE CONCAT(a, ';') = 'x'",
+])
+def test_function_in_where_not_detected(sql):
+    assert ProblemType.FUNCTION_IN_WHERE not in _problem_types(sql)
+
+
+def test_like_prefix_wildcard():
+    assert ProblemType.LIKE_PREFIX_WILDCARD in _problem_types("SELECT id FROM t WHERE name LIKE '%abc'")
+    assert ProblemType.LIKE_PREFIX_WILDCARD in _problem_types('SELECT id FROM t WHERE name LIKE "%abc"')
+    assert ProblemType.LIKE_PREFIX_WILDCARD not in _problem_types("SELECT id FROM t WHERE name LIKE 'abc%'")
+    assert ProblemType.LIKE_PREFIX_WILDCARD not in _problem_types("SELECT id FROM t WHERE name LIKE '%%'")
+
+
+def test_or_condition_requires_where():
+    assert ProblemType.OR_CONDITION in _problem_types("SELECT id FROM t WHERE a = 1 OR b = 2")
+    assert ProblemType.OR_CONDITION not in _problem_types("SELECT id FROM t JOIN u ON t.a = u.a OR t.b = u.b")
+    assert ProblemType.OR_CONDITION not in _problem_types("SELECT id FROM orders WHERE a = 1")
+
+
+def test_subquery_detected():
+    assert ProblemType.SUBQUERY_INEFFICIENT in _problem_types("SELECT a FROM ( SELECT a FROM t) x WHERE a = 1")
+    assert ProblemType.SUBQUERY_INEFFICIENT not in _problem_types("SELECT a FROM t WHERE a IN (1, 2)")
+
+
+def test_missing_where_clause():
+    assert ProblemType.NO_WHERE_CLAUSE in _problem_types("SELECT a FROM t")
+    assert ProblemType.NO_WHERE_CLAUSE not in _problem_types("SELECT COUNT(*) FROM t")
+    assert ProblemType.NO_WHERE_CLAUSE not in _problem_types("SELECT a FROM t JOIN u ON t.id = u.id")
+    assert ProblemType.NO_WHERE_CLAUSE not in _problem_types("INSERT INTO t SELECT a FROM u")
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT id FROM t WHERE id = 1 LIMIT 10",
+    "SELECT * FROM t1 WHERE DATE(d) = 20240101 OR id IN (1, 2, 3)",
+    "SELECT a FROM (SELECT a FROM t2 WHERE b = 5) x WHERE name LIKE '%42'",
+    "SELECT COUNT(1) FROM t",
+])
+def test_fingerprint_preserves_structure_problems(sql):
+    assert _analyze_sql_text(_sql_fingerprint(sql)) == _analyze_sql_text(sql)
+
+
+_BATCH_SQLS = [
+    "SELECT * FROM orders WHERE id = 1",
+    "SELECT id FROM users",
+    "SELECT a FROM t1 WHERE UPPER(b) = 'X' OR c = 2",
+    "SELECT a FROM ( SELECT a FROM t2) x WHERE a LIKE '%x'",
+    "SELECT COUNT(*) FROM big_table",
+    "INSERT INTO t SELECT * FROM u",
+]
+
+
+@pytest.fixture
+def batch_queries(make_query):
+    """覆盖各数值阈值边界和各类结构问题的慢查询"""
+    metrics = [
+        dict(execution_time=0.5),
+        dict(execution_time=5.0),
+        dict(execution_time=9.99),
+        dict(execution_time=10.0, scan_rows=10000001),
+        dict(execution_time=2.0, scan_bytes=1073741825, memory_used=536870913),
+        dict(execution_time=30.0, scan_rows=10000000, scan_bytes=1073741824, memory_used=536870912),
+    ]
+    return [
+        make_query(sql, query_id=f"q{i}_{j}", **fields)
+        for i, sql in enumerate(_BATCH_SQLS)
+        for j, fields in enumerate(metrics)
+    ]
+
+
+@pytest.mark.parametrize("config", [
+    {},
+    {'structure_analysis_min_time': 3.0},
+    {'max_scan_rows': 50, 'max_scan_bytes': 100},
+])
+def test_batch_matches_per_query_analysis(batch_queries, config):
+    analyzer = QueryAnalyzer(config)
+    expected = [analyzer.analyze_query(q) for q in batch_queries]
+    assert analyzer.analyze_queries_batch(batch_queries) == expected
+
+
+def test_batch_deep_analysis_matches_per_query(batch_queries):
+    analyzer = QueryAnalyzer({'structure_analysis_min_time': 100.0})
+    expected = [analyzer.analyze_query(q, deep_analysis=True) for q in batch_queries]
+    assert analyzer.analyze_queries_batch(batch_queries, deep_analysis=True) == expected
+
+
+def test_batch_in_process_pool_matches_per_query(batch_queries):
+    analyzer = QueryAnalyzer({'parallel_workers': 2, 'parallel_min_batch': 1})
+    expected = [analyzer.analyze_query(q) for q in batch_queries]
+    with analyzer.reuse_process_pool():
+        assert analyzer.analyze_queries_batch(batch_queries) == expected
+        executor = analyzer._executor
+        assert executor is not None
+        assert analyzer.analyze_queries_batch(batch_queries[::-1]) == expected[::-1]
+        assert analyzer._executor is executor
+    assert analyzer._executor is None
+
+
+def test_batch_empty():
+    assert QueryAnalyzer().analyze_queries_batch([]) == []
+
+
+def test_numba_kernel_matches_numpy():
+    kernel = query_analyzer._get_numba_threshold_flags()
+    if kernel is None:
+        pytest.skip("未安装 numba")
+    rng = np.random.default_rng(0)
+    n = 1000
+    args = (
+        rng.random(n) * 20,
+        rng.integers(0, 2 ** 31, n),
+        rng.integers(0, 2 ** 31, n),
+        rng.integers(0, 2 ** 30, n),
+        10 ** 6,
+        10 ** 9,
+    )
+    assert np.array_equal(kernel(*args), query_analyzer._threshold_flags_numpy(*args))
+
+
+def test_import_does_not_load_numba():
+    code = "import sys, query_analyzer; sys.exit('numba' in sys.modules)"
+    assert subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(query_analyzer.__file__)).returncode == 0
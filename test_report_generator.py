@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+report_generator 测试
+"""
+
+import gzip
+import json
+import os
+import shutil
+from datetime import datetime
+
+import pytest
+
+import report_generator
+from optimization_suggester import OptimizationSuggester
+from query_analyzer import ProblemType, QueryAnalyzer
+from report_generator import ReportGenerator
+from slow_query_collector import SlowQueryCollector
+
+
+class _FixedDateTime(datetime):
+    """固定报告时间，使不同次生成的文件名和内容可以直接比较"""
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2026, 1, 2, 12, 0, 0)
+
+
+@pytest.fixture(autouse=True)
+def fixed_now(monkeypatch):
+    monkeypatch.setattr(report_generator, 'datetime', _FixedDateTime)
+
+
+@pytest.fixture
+def report_inputs(make_query):
+    """超过 _TOP_QUERY_LIMIT 条、带问题和建议的报告输入"""
+    sqls = [
+        "SELECT * FROM orders WHERE name LIKE '%订单'",
+        "SELECT id FROM users",
+        "SELECT a FROM t1 WHERE UPPER(b) = 'X' OR c = 2",
+    ]
+    queries = [
+        make_query(sqls[i % len(sqls)], query_id=f"q{i}",
+                   execution_time=1.5 + i * 0.75, scan_rows=i * 1000003)
+        for i in range(report_generator._TOP_QUERY_LIMIT + 5)
+    ]
+    analyzer = QueryAnalyzer()
+    suggester = OptimizationSuggester()
+    problems_by_query = {}
+    suggestions_by_query = {}
+    for query, problems in zip(queries, analyzer.analyze_queries_batch(queries)):
+        problems_by_query[query.query_id] = problems
+        suggestions_by_query[query.query_id] = suggester.generate_suggestions(query, problems)
+    statistics = SlowQueryCollector(connector=None).get_query_statistics(queries)
+    metadata = {'time_range': 12, 'threshold': 1.5, 'database': 'db'}
+    return queries, statistics, problems_by_query, suggestions_by_query, metadata
+
+
+def _generate(tmp_path, name, inputs, **config):
+    config.setdefault('report_format', 'json')
+    generator = ReportGenerator(dict(config, report_dir=str(tmp_path / name)))
+    return generator.generate_report(*inputs)
+
+
+def _read(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_json_report_same_with_and_without_orjson(tmp_path, monkeypatch, report_inputs, indent):
+    if report_generator.orjson is None:
+        pytest.skip("未安装 orjson")
+    with_orjson = _read(_generate(tmp_path, 'orjson', report_inputs, json_indent=indent))
+    monkeypatch.setattr(report_generator, 'orjson', None)
+    without_orjson = _read(_generate(tmp_path, 'stdlib', report_inputs, json_indent=indent))
+    assert json.loads(with_orjson) == json.loads(without_orjson)
+    if indent is None:
+        assert with_orjson == without_orjson
+
+
+def test_json_report_indent_only_changes_layout(tmp_path, report_inputs):
+    compact = _read(_generate(tmp_path, 'compact', report_inputs))
+    indented = _read(_generate(tmp_path, 'indented', report_inputs, json_indent=4))
+    assert b'\n' not in compact
+    assert json.loads(compact) == json.loads(indented)
+
+
+def test_json_report_content(tmp_path, report_inputs):
+    queries = report_inputs[0]
+    data = json.loads(_read(_generate(tmp_path, 'json', report_inputs)))
+    assert data['metadata'] == {
+        'report_time': '2026-01-02T12:00:00',
+        'time_range_hours': 12,
+        'threshold_seconds': 1.5,
+        'database': 'db',
+    }
+    # JSON 报告包含全部慢查询，不受 _TOP_QUERY_LIMIT 限制
+    assert [q['query_id'] for q in data['slow_queries']] == [q.query_id for q in queries]
+    first = data['slow_queries'][0]
+    assert first['query_text'] == queries[0].query_text
+    assert first['start_time'] == '2026-01-02T03:04:05'
+    assert {p['type'] for p in first['problems']} >= {
+        ProblemType.SELECT_STAR.value, ProblemType.LIKE_PREFIX_WILDCARD.value,
+    }
+
+
+@pytest.mark.parametrize("fmt", ['markdown', 'json', 'html'])
+def test_multi_format_matches_single_format(tmp_path, report_inputs, fmt):
+    single = _generate(tmp_path, 'single', report_inputs, report_format=fmt)
+    multi = _generate(tmp_path, 'multi', report_inputs, report_format=['html', 'markdown', 'json'])
+    path = multi[['html', 'markdown', 'json'].index(fmt)]
+    assert path.endswith(single.rsplit('.', 1)[-1])
+    assert _read(path) == _read(single)
+
+
+def test_markdown_report_lists_top_queries_only(tmp_path, report_inputs):
+    text = _read(_generate(tmp_path, 'md', report_inputs, report_format='markdown')).decode('utf-8')
+    assert 'q0' in text
+    assert f"q{report_generator._TOP_QUERY_LIMIT - 1}" in text
+    assert f"q{report_generator._TOP_QUERY_LIMIT}" not in text
+
+
+def test_compressed_html_matches_uncompressed(tmp_path, report_inputs):
+    plain = _generate(tmp_path, 'plain', report_inputs, report_format='html')
+    compressed = _generate(tmp_path, 'gz', report_inputs, report_format='html', compress=True)
+    assert compressed.endswith('.gz')
+    assert _read(compressed) == _read(plain)
+
+
+def test_unknown_format_rejected(tmp_path, report_inputs):
+    with pytest.raises(ValueError):
+        _generate(tmp_path, 'bad', report_inputs, report_format=['json', 'pdf'])
+
+
+def test_report_dir_recreated_after_removal(tmp_path, report_inputs):
+    first = _generate(tmp_path, 'reports', report_inputs)
+    shutil.rmtree(tmp_path / 'reports')
+    # 新建的生成器和已有的生成器都会重新创建被删除的目录
+    assert _generate(tmp_path, 'reports', report_inputs) == first
+    generator = ReportGenerator({'report_format': 'markdown', 'report_dir': str(tmp_path / 'reports')})
+    shutil.rmtree(tmp_path / 'reports')
+    assert os.path.exists(generator.generate_report(*report_inputs))
+
+
+def test_report_dir_relative_to_current_directory(tmp_path, monkeypatch, report_inputs):
+    generator = ReportGenerator({'report_format': 'json', 'report_dir': 'reports'})
+    for name in ('a', 'b'):
+        (tmp_path / name).mkdir()
+        monkeypatch.chdir(tmp_path / name)
+        generator.generate_report(*report_inputs)
+        assert len(os.listdir(tmp_path / name / 'reports')) == 1
+
+
+def test_duplicate_formats_generated_once(tmp_path, report_inputs):
+    paths = _generate(tmp_path, 'dup', report_inputs, report_format=['html', 'json', 'html'])
+    assert [os.path.splitext(path)[1] for path in paths] == ['.html', '.json']
+    assert len(os.listdir(tmp_path / 'dup')) == 2
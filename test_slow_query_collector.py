@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+slow_query_collector 测试
+"""
+
+import logging
+from decimal import Decimal
+
+import numpy as np
+import pymysql
+import pytest
+
+from slow_query_collector import SlowQueryCollector, _format_bytes, _format_rows
+
+
+def _group_ids(queries):
+    groups = SlowQueryCollector(connector=None).group_by_table(queries)
+    return {table: [q.query_id for q in group] for table, group in groups.items()}
+
+
+def test_group_by_table(make_query):
+    queries = [
+        make_query("SELECT * FROM orders WHERE id = 1", query_id="q1"),
+        make_query("SELECT a FROM users u JOIN orders o ON u.id = o.uid WHERE a = 1", query_id="q2"),
+        make_query("INSERT INTO archive SELECT * FROM orders", query_id="q3"),
+        make_query("UPDATE users SET a = 1 WHERE id = 2", query_id="q4"),
+    ]
+    assert _group_ids(queries) == {
+        'orders': ['q1', 'q2', 'q3'],
+        'users': ['q2', 'q4'],
+        'archive': ['q3'],
+    }
+
+
+def test_group_by_table_qualified_and_quoted_names(make_query):
+    queries = [
+        make_query("SELECT a FROM `db`.`t1` WHERE a = 1", query_id="q1"),
+        make_query('SELECT a FROM "db".t1 WHERE a = 1', query_id="q2"),
+        make_query("select a from [t2] join t2 on 1 = 1", query_id="q3"),
+    ]
+    assert _group_ids(queries) == {'db.t1': ['q1', 'q2'], 't2': ['q3']}
+
+
+def test_group_by_table_ignores_keywords_and_subqueries(make_query):
+    queries = [
+        make_query("SELECT a FROM (SELECT a FROM inner_t) x WHERE a = 1", query_id="q1"),
+        make_query("SELECT 1", query_id="q2"),
+    ]
+    assert _group_ids(queries) == {'inner_t': ['q1']}
+
+
+def test_group_by_table_returns_plain_dict(make_query):
+    groups = SlowQueryCollector(connector=None).group_by_table([make_query()])
+    assert type(groups) is dict
+    assert groups == {'t': [make_query()]}
+
+
+@pytest.mark.parametrize("n, expected", [
+    (0, "0 B"),
+    (1023, "1023 B"),
+    (1024, "1.00 KB"),
+    (1048575, "1024.00 KB"),
+    (1048576, "1.00 MB"),
+    (1073741823, "1024.00 MB"),
+    (1073741824, "1.00 GB"),
+    (5 * 1099511627776, "5120.00 GB"),
+    (Decimal(5000000), "4.77 MB"),
+    (Decimal('1023.5'), "1023.5 B"),
+    (2048.0, "2.00 KB"),
+    (np.int64(1073741824), "1.00 GB"),
+])
+def test_format_bytes(n, expected):
+    assert _format_bytes(n) == expected
+
+
+@pytest.mark.parametrize("n, expected", [
+    (0, "0"),
+    (9999, "9999"),
+    (10000, "1.00 万"),
+    (99999999, "10000.00 万"),
+    (100000000, "1.00 亿"),
+    (Decimal(123456), "12.35 万"),
+    (np.int64(250000000), "2.50 亿"),
+])
+def test_format_rows(n, expected):
+    assert _format_rows(n) == expected
+
+
+@pytest.mark.parametrize("execution_time, expected", [
+    (0.99, "LOW"),
+    (1.0, "MEDIUM"),
+    (4.99, "MEDIUM"),
+    (5.0, "HIGH"),
+    (10.0, "CRITICAL"),
+])
+def test_severity(make_query, execution_time, expected):
+    assert make_query(execution_time=execution_time).severity == expected
+
+
+def test_formatted_properties(make_query):
+    query = make_query(scan_rows=123456, scan_bytes=5000000)
+    assert query.scan_rows_formatted == "12.35 万"
+    assert query.scan_bytes_formatted == "4.77 MB"
+
+
+class _FailingConnector:
+    """先返回一批空结果，再抛出指定异常的连接器"""
+    driver_error = pymysql.Error
+
+    def __init__(self, error):
+        self.error = error
+
+    def iter_query_batches(self, sql, params=None, batch_size=500):
+        yield []
+        raise self.error
+
+
+def test_collect_drops_partial_result_on_driver_error(caplog):
+    collector = SlowQueryCollector(_FailingConnector(pymysql.err.OperationalError(2013, "Lost connection")))
+    with caplog.at_level(logging.WARNING, logger='slow_query_collector'):
+        assert collector.collect_slow_queries() == []
+    assert "Lost connection" in caplog.text
+
+
+def test_collect_propagates_non_driver_errors():
+    collector = SlowQueryCollector(_FailingConnector(KeyError('query_id')))
+    with pytest.raises(KeyError):
+        collector.collect_slow_queries()
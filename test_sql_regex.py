@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+sql_regex 测试
+"""
+
+import re
+
+import pytest
+
+import sql_regex
+from sql_regex import compile_pattern
+
+
+@pytest.fixture(params=['re2', 're'])
+def backend(request, monkeypatch):
+    """分别在 RE2 和 re 回退下运行"""
+    if request.param == 're2':
+        if sql_regex.re2 is None:
+            pytest.skip("未安装 google-re2")
+    else:
+        monkeypatch.setattr(sql_regex, 're2', None)
+    return request.param
+
+
+def test_word_classes_are_ascii(backend):
+    pattern = compile_pattern(r'\b\w+\b')
+    assert pattern.findall('orders_1 订单 é') == ['orders_1']
+
+
+def test_ignorecase(backend):
+    pattern = compile_pattern(r'\bFROM\s+(\w+)', re.IGNORECASE)
+    assert pattern.search('select 1 from t1').group(1) == 't1'
+
+
+def test_lookahead_falls_back_to_re():
+    pattern = compile_pattern(r'SELECT(?=\s+\*)', re.IGNORECASE)
+    assert pattern.search('select * from t')